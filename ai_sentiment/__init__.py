@@ -1,3 +1,28 @@
-from . import data
-from . import nlp
-from . import scraper
+"""Submodules are imported on first access, so that loading results doesn't pull in spacy, torch or praw"""
+from importlib import import_module
+
+__all__ = [
+    "cache",
+    "corpus",
+    "data",
+    "docstore",
+    "extract",
+    "filters",
+    "frequencies",
+    "models",
+    "nlp",
+    "parallel",
+    "pipeline",
+    "render",
+    "results",
+    "scraper",
+    "stats",
+    "targets",
+    "wordscores"
+]
+
+
+def __getattr__(name):
+  if name in __all__:
+    return import_module(f".{name}", __name__)
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
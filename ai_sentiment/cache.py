@@ -0,0 +1,255 @@
+import pickle
+import sqlite3
+import threading
+from hashlib import sha256
+from pathlib import Path
+from time import time
+from typing import Any, List, NamedTuple, Optional
+
+
+def openDatabase(path: Path, schema: str, check_same_thread: bool = True) -> sqlite3.Connection:
+  """Open (creating if needed) a sqlite file shared by several processes, and apply schema"""
+
+  path.parent.mkdir(parents = True, exist_ok = True)
+  db = sqlite3.connect(path, timeout = 60, check_same_thread = check_same_thread)
+  db.execute("PRAGMA journal_mode=WAL")
+  db.execute("PRAGMA synchronous=NORMAL")
+  db.executescript(schema)
+  db.commit()
+  return db
+
+
+class ThreadDatabase:
+
+  def __init__(self, path: Path, schema: str):
+    """sqlite file opened separately by every thread that uses it
+
+        sqlite connections can't be used from a thread other than the one
+        that opened them, so caches shared with scraper threads get one
+        connection per thread, opened on first use. WAL mode lets them read
+        and write alongside each other like separate processes do.
+
+        Args:
+            path: a Pathlib object or str to the sqlite file
+            schema: Script applied whenever a connection is opened"""
+
+    self.path = Path(path)
+    self.schema = schema
+    self.local = threading.local()
+    self.lock = threading.Lock()
+    self.connections: List[sqlite3.Connection] = []
+
+    # Open one connection now, so schema errors surface in the caller's thread
+    self.connection()
+
+  def connection(self) -> sqlite3.Connection:
+    """The calling thread's connection"""
+    db = getattr(self.local, "db", None)
+    if db is None:
+      # Only ever used by this thread, the check is relaxed so that close() can close it from another
+      db = self.local.db = openDatabase(self.path, self.schema, check_same_thread = False)
+      with self.lock:
+        self.connections.append(db)
+    return db
+
+  def close(self):
+    """Commit and close every thread's connection"""
+    with self.lock:
+      for db in self.connections:
+        db.commit()
+        db.close()
+      self.connections = []
+    self.local = threading.local()
+
+
+class ResultCache:
+
+  def __init__(self, path: Path, max_bytes: int = 2**30):
+    """On-disk, size-bounded LRU cache of classification results
+
+        Entries are keyed by a hash of the article body and a namespace that
+        identifies the pipeline, model and package versions that produced
+        them (see SentimentClassifier.cacheNamespace).
+
+        Args:
+            path: a Pathlib object or str to the sqlite file backing the cache
+            max_bytes: Once stored values exceed this size, the least
+                recently used entries are evicted"""
+
+    self.path = Path(path)
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+
+    self.database = ThreadDatabase(
+        self.path,
+        "CREATE TABLE IF NOT EXISTS entries "
+        "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL);"
+        "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);"
+    )
+
+    # Running total of stored bytes, only recounted when eviction looks necessary
+    self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+  @property
+  def db(self) -> sqlite3.Connection:
+    """Connection for the calling thread, see ThreadDatabase"""
+    return self.database.connection()
+
+  @staticmethod
+  def key(namespace: str, body: str) -> str:
+    """Content address for a body processed under namespace"""
+    return sha256(f"{namespace}\0{body}".encode("utf-8", "surrogatepass")).hexdigest()
+
+  def get(self, key: str) -> Optional[Any]:
+    """Return the cached value for key, or None on a miss"""
+
+    row = self.db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+    if row is None:
+      self.misses += 1
+      return None
+
+    self.hits += 1
+    self.db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time(), key))
+    self.db.commit()
+    return pickle.loads(row[0])
+
+  def put(self, key: str, value: Any):
+    """Store value under key, evicting old entries if the cache is over its size bound"""
+
+    blob = pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL)
+    old = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+    self.total_bytes += len(blob) - (old[0] if old else 0)
+    self.db.execute(
+        "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+        (key, blob, len(blob), time())
+    )
+    if self.total_bytes > self.max_bytes:
+      self.evict()
+    self.db.commit()
+
+  def evict(self):
+    """Drop least recently used entries until the cache fits in max_bytes"""
+
+    # Other processes may share this file, so recount before deleting anything
+    total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    self.total_bytes = total
+    if total <= self.max_bytes:
+      return
+
+    freed = 0
+    stale = []
+    for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+      if total - freed <= self.max_bytes:
+        break
+      stale.append((key,))
+      freed += size
+
+    self.db.executemany("DELETE FROM entries WHERE key = ?", stale)
+    self.total_bytes = total - freed
+
+  def clear(self):
+    """Remove every entry and reset the counters"""
+    self.db.execute("DELETE FROM entries")
+    self.db.commit()
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self) -> int:
+    return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+  def stats(self) -> dict:
+    """Hit/miss counters for this session and current cache occupancy"""
+    entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+    return { "hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+  def close(self):
+    self.database.close()
+
+  # Reopen the database by path when sent to worker processes
+  def __getstate__(self):
+    return { "path": self.path, "max_bytes": self.max_bytes}
+
+  def __setstate__(self, state):
+    self.__init__(state["path"], state["max_bytes"])
+
+
+class CachedResponse(NamedTuple):
+  body: str
+  etag: Optional[str]
+  last_modified: Optional[str]
+  fetched_at: float
+
+
+class ResponseCache:
+
+  def __init__(self, path: Path):
+    """On-disk cache of scraped pages keyed by URL
+
+        Stores each page body with its ETag and Last-Modified validators so
+        re-scrapes can be conditional requests, and so a scraper in offline
+        mode can serve pages without the network.
+
+        Args:
+            path: a Pathlib object or str to the sqlite file backing the cache"""
+
+    self.path = Path(path)
+    self.database = ThreadDatabase(
+        self.path,
+        "CREATE TABLE IF NOT EXISTS responses "
+        "(url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL);"
+    )
+
+  @property
+  def db(self) -> sqlite3.Connection:
+    """Connection for the calling thread, see ThreadDatabase"""
+    return self.database.connection()
+
+  def get(self, url: str) -> Optional[CachedResponse]:
+    """Return the cached response for url, or None if it was never fetched"""
+
+    row = self.db.execute(
+        "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+    ).fetchone()
+    return None if row is None else CachedResponse(*row)
+
+  def put(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+    self.db.execute(
+        "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at) "
+        "VALUES (?, ?, ?, ?, ?)", (url, body, etag, last_modified, time())
+    )
+    self.db.commit()
+
+  def touch(self, url: str):
+    """Record that a cached response was revalidated with the server"""
+    self.db.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time(), url))
+    self.db.commit()
+
+  @staticmethod
+  def conditionalHeaders(cached: Optional[CachedResponse]) -> dict:
+    """Request headers that let the server answer 304 Not Modified for a cached response"""
+
+    headers = {}
+    if cached is not None:
+      if cached.etag:
+        headers["If-None-Match"] = cached.etag
+      if cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+  def __contains__(self, url: str) -> bool:
+    return self.db.execute("SELECT 1 FROM responses WHERE url = ?", (url,)).fetchone() is not None
+
+  def __len__(self) -> int:
+    return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+  def close(self):
+    self.database.close()
+
+  # Reopen the database by path when sent to worker processes
+  def __getstate__(self):
+    return { "path": self.path}
+
+  def __setstate__(self, state):
+    self.__init__(state["path"])
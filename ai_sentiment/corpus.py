@@ -0,0 +1,196 @@
+import json
+import os
+from enum import Enum
+from hashlib import sha1
+from pathlib import Path
+from re import compile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.wordscores import wordScorePairs
+
+
+class Classification(Enum):
+  LEFT = "#2e65a1"
+  LEANS_LEFT = "#9dc8eb"
+  CENTER = "#9766a0"
+  LEANS_RIGHT = "#cb9a98"
+  RIGHT = "#cb2127"
+
+
+SOURCE_CLASSIFICATIONS = {
+    "Daily Caller": Classification.RIGHT,
+    "Daily Wire": Classification.RIGHT,
+    "NY Post": Classification.RIGHT,
+    "Epoch Times": Classification.LEANS_RIGHT,
+    "Fox News Online": Classification.LEANS_RIGHT,
+    "WSJ Opinion": Classification.LEANS_RIGHT,
+    "Washington Examiner": Classification.LEANS_RIGHT,
+    "Reuters": Classification.CENTER,
+    "WSJ": Classification.CENTER,
+    "Wall Street Journal": Classification.CENTER,
+    "New York Times": Classification.LEANS_LEFT,
+    "USA Today": Classification.LEANS_LEFT,
+    "Washington Post": Classification.LEANS_LEFT,
+    "Washington Post Opinion": Classification.LEANS_LEFT,
+    "Washington Post Opinion Letters": Classification.LEANS_LEFT,
+    "New York Times Opinion": Classification.LEFT,
+    "New York Times Opinion Letters": Classification.LEFT,
+    "New Yorker": Classification.LEFT,
+    "The Atlantic": Classification.LEFT,
+    "Vox": Classification.LEFT,
+}
+
+NAME_MAP = {
+    "WSJ": "Wall Street Journal",
+    "New York Times Opinion Letters": "New York Times Opinion",
+    "Washington Post Opinion Letters": "Washington Post Opinion"
+}
+
+SOURCE_REGEX = compile(r"- ([^_]*)_")
+
+# Sentiment engines, identified by the suffix CSV_Scrape.py gives result files
+ENGINES = ["asent", "textblob"]
+
+# Category orders of the source and alignment columns
+SOURCES = list(dict.fromkeys(NAME_MAP.get(s, s) for s in SOURCE_CLASSIFICATIONS))
+ALIGNMENTS = [c.name for c in Classification]
+
+# Columns the plotting scripts need, everything but the article text
+LOAD_COLUMNS = ["sentiment_score", "positive_words", "negative_words"]
+
+# Schema metadata key holding the stamp of the files a snapshot was built from
+SNAPSHOT_STAMP = b"ai_sentiment.corpus.stamp"
+
+
+def sourceName(path: str) -> str:
+  """Canonical source name for a results file, from the export name in its path"""
+  match = SOURCE_REGEX.search(str(path))
+  if match is None:
+    raise ValueError(f"No source name in {path}")
+
+  source_name = NAME_MAP.get(match.group(1), match.group(1))
+  if source_name not in SOURCE_CLASSIFICATIONS:
+    raise ValueError(f"Unknown source {source_name!r} in {path}, add it to SOURCE_CLASSIFICATIONS")
+  return source_name
+
+
+def engineName(path: str) -> Optional[str]:
+  """Sentiment engine that produced a results file, or None if the name doesn't say"""
+  name = Path(path).name
+  return next((e for e in ENGINES if e in name), None)
+
+
+def buildCorpus(paths: List[str], columns: Optional[List[str]]) -> pd.DataFrame:
+  """Load results files into one frame with categorical path, source, alignment and engine columns"""
+
+  frames = [SentimentClassifier.loadResults(p, columns = columns) for p in paths]
+  if not frames:
+    return pd.DataFrame(columns = ["path", "source", "alignment", "engine"] + (columns or []))
+
+  lengths = np.array([len(f) for f in frames])
+  # Empty files have untyped columns that would turn sentiment_score into objects
+  corpus = pd.concat([f for f in frames if len(f)] or frames[:1], ignore_index = True)
+  if "word_scores" in corpus.columns:
+    # Parquet files give structs, CSV files tuples
+    corpus["word_scores"] = [wordScorePairs(cell) for cell in corpus["word_scores"]]
+
+  # Per-file codes repeated over each file's rows, no per-row Python work
+  sources = [sourceName(p) for p in paths]
+  file_codes = [
+      np.arange(len(paths)),
+      [SOURCES.index(s) for s in sources],
+      [ALIGNMENTS.index(SOURCE_CLASSIFICATIONS[s].name) for s in sources],
+      [ENGINES.index(e) if e else -1 for e in map(engineName, paths)],
+  ]
+  categories = [paths, SOURCES, ALIGNMENTS, ENGINES]
+  for name, codes, cats in zip(["path", "source", "alignment", "engine"], file_codes, categories):
+    corpus.insert(
+        len(corpus.columns) - len(frames[0].columns),
+        name,
+        pd.Categorical.from_codes(
+            np.repeat(np.asarray(codes, dtype = np.int32), lengths), cats, ordered = True
+        ),
+    )
+  return corpus
+
+
+def filesStamp(paths: List[str], columns: Optional[List[str]]) -> bytes:
+  """Changes whenever any of the files is modified, or the loaded columns change"""
+  stats = [(p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+  return sha1(json.dumps([stats, columns]).encode()).hexdigest().encode()
+
+
+def loadCorpus(
+    paths: Iterable, columns: Optional[List[str]] = LOAD_COLUMNS, snapshot_dir: Path = None
+) -> pd.DataFrame:
+  """Load every results file into one frame, ready to group by source, alignment or engine
+
+    Adds ordered categorical columns path, source (canonical name),
+    alignment (Classification name) and engine ("asent", "textblob" or
+    missing) ahead of the loaded result columns. word_scores cells are
+    lists of (word, score) tuples whatever format the files are in.
+
+    With snapshot_dir, the frame is also saved there as an Arrow IPC
+    (Feather v2) file, one per set of paths and columns. Later calls memory
+    map it instead of parsing the CSVs, until any of the files changes.
+    Snapshots need pyarrow, without it every call loads the CSVs.
+
+    Args:
+        paths: Results files, in the order their rows should appear
+        columns: Result columns to load, None loads all of them
+        snapshot_dir: a Pathlib object or str to the snapshot directory
+
+    Return:
+        Data frame with one row per result"""
+
+  paths = list(dict.fromkeys(str(p) for p in paths))
+  if snapshot_dir is None:
+    return buildCorpus(paths, columns)
+
+  try:
+    import pyarrow as pa
+  except ImportError:
+    return buildCorpus(paths, columns)
+
+  snapshot_dir = Path(snapshot_dir)
+  name = sha1(json.dumps([[os.path.abspath(p) for p in paths], columns]).encode()).hexdigest()
+  snapshot = snapshot_dir / f"corpus-{name}.arrow"
+  stamp = filesStamp(paths, columns)
+
+  if snapshot.exists():
+    with pa.memory_map(str(snapshot)) as source:
+      table = pa.ipc.open_file(source).read_all()
+    if (table.schema.metadata or {}).get(SNAPSHOT_STAMP) == stamp:
+      corpus = table.to_pandas()
+      if "word_scores" in corpus.columns:
+        corpus["word_scores"] = [wordScorePairs(cell) for cell in corpus["word_scores"]]
+      return corpus
+
+  corpus = buildCorpus(paths, columns)
+  snapshot_frame = corpus
+  if "word_scores" in corpus.columns:
+    # Arrow can't infer a type for (word, score) tuples, store them as the structs Parquet results use
+    snapshot_frame = corpus.assign(
+        word_scores = [[{
+            "word": w, "score": s
+        } for w, s in cell] for cell in corpus["word_scores"]]
+    )
+  table = pa.Table.from_pandas(snapshot_frame, preserve_index = False)
+  table = table.replace_schema_metadata({ **(table.schema.metadata or {}), SNAPSHOT_STAMP: stamp})
+
+  snapshot_dir.mkdir(parents = True, exist_ok = True)
+  partial = snapshot.with_suffix(".partial")
+  with pa.OSFile(str(partial), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+    writer.write_table(table)
+  os.replace(partial, snapshot)
+  return corpus
+
+
+def groupWords(corpus: pd.DataFrame, column: str, by: str = "source") -> Dict[str, List[str]]:
+  """Every word in a list column, grouped by a categorical column"""
+  words = corpus[[by, column]].explode(column).dropna()
+  return { key: group.tolist() for key, group in words.groupby(by, observed = True)[column] }
@@ -1,32 +1,35 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
 
 
 @dataclass
 class ClassificationTarget:
-    title: str
-    body: str
-    tags: List[str]
+  title: str
+  body: str
+  tags: List[str]
 
-    @staticmethod
-    def yamlRepresenter(dumper, data):
-        """Static method passed to yaml to dump objects"""
-        return dumper.represent_mapping('!ClassificationTarget',
-                                        {'title': data.title,
-                                         'body': data.body,
-                                         'tags': data.tags})
+  @staticmethod
+  def yamlRepresenter(dumper, data):
+    """Static method passed to yaml to dump objects"""
+    return dumper.represent_mapping(
+        '!ClassificationTarget', {
+            'title': data.title, 'body': data.body, 'tags': data.tags
+        }
+    )
 
-    @staticmethod
-    def yamlConstructor(loader, node):
-        """Static method passed to yaml to load objects"""
-        fields = loader.construct_mapping(node, deep=True)
-        return ClassificationTarget(**fields)
+  @staticmethod
+  def yamlConstructor(loader, node):
+    """Static method passed to yaml to load objects"""
+    fields = loader.construct_mapping(node, deep = True)
+    return ClassificationTarget(**fields)
 
 
 @dataclass
 class ClassificationResult:
-    target: ClassificationTarget
-    sentiment_score: float
-    positive_words: List[str]
-    negative_words: List[str]
-    word_scores: List[tuple]
+  target: ClassificationTarget
+  sentiment_score: float
+  positive_words: List[str]
+  negative_words: List[str]
+  word_scores: List[tuple] = field(default_factory = list)
+  token_count: int = 0
+  char_count: int = 0
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from ai_sentiment.cache import openDatabase
+
+if TYPE_CHECKING:
+  from spacy.tokens import Doc
+  from spacy.vocab import Vocab
+
+
+class DocStore:
+
+  def __init__(self, path: Path):
+    """On-disk store of processed spaCy Docs, one DocBin per article
+
+        Only the annotations set by the base pipeline (tokens, tags, parse,
+        entities, sentence boundaries) are stored. Custom extension values
+        such as doc._.blob hold objects msgpack can't serialise, so the
+        classifier re-runs its sentiment components on loaded Docs to rebuild
+        them. Those components are cheap next to the transformer.
+
+        Args:
+            path: a Pathlib object or str to the sqlite file backing the store"""
+
+    self.path = Path(path)
+    self.db = openDatabase(
+        self.path, "CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, data BLOB NOT NULL);"
+    )
+
+  def get(self, key: str, vocab: "Vocab") -> Optional["Doc"]:
+    """Return the Doc stored under key, attached to vocab, or None if it is missing"""
+    from spacy.tokens import DocBin
+
+    row = self.db.execute("SELECT data FROM docs WHERE key = ?", (key,)).fetchone()
+    if row is None:
+      return None
+
+    return next(DocBin().from_bytes(row[0]).get_docs(vocab))
+
+  def put(self, key: str, doc: "Doc"):
+    """Serialise doc and store it under key"""
+    from spacy.tokens import DocBin
+
+    data = DocBin(docs = [doc], store_user_data = False).to_bytes()
+    self.db.execute("INSERT OR REPLACE INTO docs (key, data) VALUES (?, ?)", (key, data))
+    self.db.commit()
+
+  def __contains__(self, key: str) -> bool:
+    return self.db.execute("SELECT 1 FROM docs WHERE key = ?", (key,)).fetchone() is not None
+
+  def __len__(self) -> int:
+    return self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+  def close(self):
+    self.db.commit()
+    self.db.close()
+
+  # Reopen the database by path when sent to worker processes
+  def __getstate__(self):
+    return { "path": self.path}
+
+  def __setstate__(self, state):
+    self.__init__(state["path"])
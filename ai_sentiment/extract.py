@@ -0,0 +1,69 @@
+from typing import Callable, Dict
+
+# Elements whose contents never count as article text
+BOILERPLATE_TAGS = ("script", "style", "meta", "label", "header", "footer")
+
+
+def normaliseText(text: str) -> str:
+  """Lowercase, trim and drop blank lines, the normalisation every backend shares"""
+  text = text.lower().strip().replace("  ", "")
+  return "".join([s for s in text.splitlines(True) if s.strip("\r\n")])
+
+
+def bs4Extract(html_page: str) -> str:
+  """Original extractor, BeautifulSoup with Python's html.parser"""
+  from bs4 import BeautifulSoup
+
+  soup = BeautifulSoup(html_page, 'html.parser')
+  for script in soup(list(BOILERPLATE_TAGS)):
+    script.decompose()
+  return normaliseText(soup.get_text())
+
+
+def lxmlExtract(html_page: str) -> str:
+  """libxml2's HTML parser, boilerplate is stripped in a single pass over the tree"""
+  import lxml.html
+  from lxml import etree
+
+  if not html_page.strip():
+    return ""
+
+  # Parse bytes so that pages carrying an XML encoding declaration are accepted
+  parser = lxml.html.HTMLParser(encoding = "utf-8")
+  tree = lxml.html.fromstring(html_page.encode("utf-8", "surrogatepass"), parser = parser)
+  etree.strip_elements(tree, *BOILERPLATE_TAGS, with_tail = False)
+  return normaliseText(tree.text_content())
+
+
+def selectolaxExtract(html_page: str) -> str:
+  """Lexbor parser through selectolax, the fastest backend"""
+  from selectolax.lexbor import LexborHTMLParser
+
+  tree = LexborHTMLParser(html_page)
+  tree.strip_tags(list(BOILERPLATE_TAGS))
+  if tree.root is None:
+    return ""
+  return normaliseText(tree.root.text(separator = ""))
+
+
+# Available backends by name, see WebScraper's extractor argument
+EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    "bs4": bs4Extract,
+    "lxml": lxmlExtract,
+    "selectolax": selectolaxExtract,
+}
+
+
+def extractText(html_page: str, backend: str = "bs4") -> str:
+  """Strip markup and boilerplate tags from a page and normalise its text
+
+    Args:
+        html_page: Raw HTML
+        backend: Name of an entry in EXTRACTORS
+
+    Return:
+        Lowercased page text without blank lines"""
+
+  if backend not in EXTRACTORS:
+    raise ValueError(f"Unknown extractor {backend!r}, expected one of {', '.join(EXTRACTORS)}")
+  return EXTRACTORS[backend](html_page)
@@ -0,0 +1,254 @@
+import csv
+import re
+from collections import Counter, defaultdict
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from ai_sentiment.data import ClassificationTarget
+
+WORD_REGEX = re.compile(r"[a-z']+")
+
+# Frequent English function words, they make up roughly half of any English text
+ENGLISH_STOPWORDS = frozenset(
+    "a about after all also an and any are as at be because been but by can could did do does for from "
+    "had has have he her his how i if in into is it its just more most my no not of on one or other our "
+    "out she so some such than that the their them then there these they this those to up was we were "
+    "what when which who will with would you your".split()
+)
+
+# Modulus of the MinHash permutations, a Mersenne prime so products reduce with shifts and masks
+MINHASH_PRIME = (1 << 61) - 1
+LOW_32 = np.uint64(0xFFFFFFFF)
+
+
+class Skip(NamedTuple):
+  title: str
+  reason: str
+  detail: str
+
+
+def normaliseBody(body: str) -> str:
+  """Lowercased body with runs of whitespace collapsed, so trivially reformatted copies compare equal"""
+  return " ".join(body.lower().split())
+
+
+def leadingWords(body: str, max_words: int = 2000) -> List[str]:
+  """Up to max_words lowercased words from the start of body, without scanning the rest of it"""
+  return WORD_REGEX.findall(body.lower(), 0, max_words * 16)[:max_words]
+
+
+def stopwordRatio(words: List[str]) -> float:
+  """Fraction of words that are English stopwords"""
+  if not words:
+    return 0.0
+  return sum(w in ENGLISH_STOPWORDS for w in words) / len(words)
+
+
+def bandLayout(num_perm: int, threshold: float, recall: float = 0.95):
+  """(bands, rows) splitting num_perm hashes into LSH bands
+
+    Picks the layout with the longest bands, so the fewest candidates to
+    verify, that still makes a pair of bodies at threshold similarity a
+    candidate with probability at least recall."""
+
+  layouts = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+  for bands, rows in layouts:
+    if 1 - (1 - threshold**rows)**bands >= recall:
+      return bands, rows
+  return layouts[-1]
+
+
+def shingleHashes(shingles: Iterable[str]) -> np.ndarray:
+  """61 bit hash of each shingle"""
+  digests = b"".join(blake2b(s.encode("utf-8", "surrogatepass"), digest_size = 8).digest() for s in shingles)
+  return np.frombuffer(digests, dtype = "<u8") & np.uint64(MINHASH_PRIME)
+
+
+def reduceMersenne(v: np.ndarray) -> np.ndarray:
+  """v mod MINHASH_PRIME for v below 2**64, may leave values in [p, p + 8)"""
+  return (v & np.uint64(MINHASH_PRIME)) + (v >> np.uint64(61))
+
+
+def mulAddMod(a: np.ndarray, x: np.ndarray, b: np.ndarray) -> np.ndarray:
+  """(a * x + b) mod MINHASH_PRIME for uint64 arrays below it, without overflowing 64 bits
+
+    a and x are split into 32 bit halves and the partial products folded
+    using 2**61 = 1 (mod p)."""
+
+  a_hi, a_lo = a >> np.uint64(32), a & LOW_32
+  x_hi, x_lo = x >> np.uint64(32), x & LOW_32
+  # 2**64 = 8 (mod p)
+  high = (a_hi * x_hi) << np.uint64(3)
+  # middle * 2**32, split where the shift would pass 2**61
+  middle = a_hi * x_lo + a_lo * x_hi
+  middle = (middle >> np.uint64(29)) + ((middle & np.uint64((1 << 29) - 1)) << np.uint64(32))
+  total = reduceMersenne(high + middle + reduceMersenne(a_lo * x_lo) + b)
+  total = reduceMersenne(total)
+  return np.where(total >= np.uint64(MINHASH_PRIME), total - np.uint64(MINHASH_PRIME), total)
+
+
+class MinHashIndex:
+
+  def __init__(self, threshold: float = 0.85, num_perm: int = 64, shingle_words: int = 5, seed: int = 0):
+    """Near-duplicate detector over word shingles, using MinHash signatures and LSH banding
+
+        Each body is reduced to num_perm minimum hashes of its word
+        shingles. Signatures are split into bands, and only bodies sharing a
+        whole band are compared, so lookups don't scale with the number of
+        bodies seen.
+
+        Args:
+            threshold: Estimated Jaccard similarity at which bodies count as duplicates
+            num_perm: Hash functions per signature, more is more accurate and slower
+            shingle_words: Words per shingle
+            seed: Seed for the hash functions"""
+
+    self.threshold = threshold
+    self.num_perm = num_perm
+    self.shingle_words = shingle_words
+    self.bands, self.rows = bandLayout(num_perm, threshold)
+
+    rng = np.random.default_rng(seed)
+    self.a = rng.integers(1, MINHASH_PRIME, size = (num_perm, 1), dtype = np.uint64)
+    self.b = rng.integers(1, MINHASH_PRIME, size = (num_perm, 1), dtype = np.uint64)
+
+    self.buckets: Dict[bytes, List[int]] = defaultdict(list)
+    self.signatures: List[np.ndarray] = []
+    self.labels: List[str] = []
+
+  def signature(self, body: str) -> np.ndarray:
+    words = WORD_REGEX.findall(body.lower())
+    n = self.shingle_words
+    shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+    return mulAddMod(self.a, shingleHashes(shingles), self.b).min(axis = 1)
+
+  def bandKeys(self, signature: np.ndarray) -> List[bytes]:
+    return [
+        i.to_bytes(2, "little") + signature[i * self.rows:(i + 1) * self.rows].tobytes()
+        for i in range(self.bands)
+    ]
+
+  def query(self, signature: np.ndarray):
+    """(label, similarity) of the most similar indexed body above threshold, or None"""
+    candidates = { j for key in self.bandKeys(signature) for j in self.buckets.get(key, ()) }
+    best = None
+    for j in candidates:
+      similarity = float(np.mean(self.signatures[j] == signature))
+      if similarity >= self.threshold and (best is None or similarity > best[1]):
+        best = (self.labels[j], similarity)
+    return best
+
+  def add(self, signature: np.ndarray, label: str):
+    for key in self.bandKeys(signature):
+      self.buckets[key].append(len(self.signatures))
+    self.signatures.append(signature)
+    self.labels.append(label)
+
+
+class TargetFilter:
+
+  def __init__(
+      self,
+      min_chars: int = 200,
+      max_chars: Optional[int] = 200_000,
+      dedup: bool = True,
+      near_dup_threshold: Optional[float] = 0.85,
+      min_stopword_ratio: Optional[float] = 0.15,
+      min_language_words: int = 30
+  ):
+    """Drops targets that aren't worth a transformer pass, recording why
+
+        Checks run cheapest first: empty and length bounds, English stopword
+        ratio, exact duplicates by hash of the normalised body, then
+        near-duplicates by MinHash. Only targets that pass are indexed for
+        duplicate checks, so the first copy of an article is always kept.
+
+        Args:
+            min_chars: Bodies shorter than this are skipped
+            max_chars: Bodies longer than this are skipped, None for no limit
+            dedup: Skip bodies identical to an earlier one after normalisation
+            near_dup_threshold: Skip bodies whose estimated Jaccard similarity
+                to an earlier one is at least this, None disables the check
+            min_stopword_ratio: Skip bodies where fewer than this fraction of
+                words are English stopwords, None disables the check
+            min_language_words: Bodies with fewer words aren't language checked"""
+
+    self.min_chars = min_chars
+    self.max_chars = max_chars
+    self.dedup = dedup
+    self.min_stopword_ratio = min_stopword_ratio
+    self.min_language_words = min_language_words
+
+    self.near_dups = MinHashIndex(near_dup_threshold) if near_dup_threshold is not None else None
+    self.seen: Dict[bytes, str] = {}
+    self.skipped: List[Skip] = []
+    self.kept = 0
+
+  def reason(self, target: ClassificationTarget):
+    """(reason, detail) for skipping target or None to keep it, indexing kept targets for dedup"""
+
+    body = target.body
+    if not isinstance(body, str) or body.strip().lower() in ("", "nan"):
+      return "empty", ""
+    size = len(body.strip())
+    if size < self.min_chars:
+      return "too_short", f"{size} chars"
+    if self.max_chars is not None and size > self.max_chars:
+      return "too_long", f"{size} chars"
+
+    if self.min_stopword_ratio is not None:
+      words = leadingWords(body)
+      ratio = stopwordRatio(words)
+      if ratio < self.min_stopword_ratio and len(words) >= self.min_language_words:
+        return "not_english", f"stopword ratio {ratio:.2f}"
+
+    normalised = normaliseBody(body)
+    digest = blake2b(normalised.encode("utf-8", "surrogatepass"), digest_size = 16).digest()
+    if self.dedup and digest in self.seen:
+      return "duplicate", f"same body as {self.seen[digest]!r}"
+
+    signature = None
+    if self.near_dups is not None:
+      signature = self.near_dups.signature(normalised)
+      match = self.near_dups.query(signature)
+      if match is not None:
+        return "near_duplicate", f"{match[1]:.2f} similar to {match[0]!r}"
+
+    self.seen[digest] = target.title
+    if signature is not None:
+      self.near_dups.add(signature, target.title)
+    return None
+
+  def __call__(self, targets: Iterable[ClassificationTarget]) -> Iterator[ClassificationTarget]:
+    """Yield the targets that pass every check, recording the rest in self.skipped"""
+    for target in targets:
+      skip = self.reason(target)
+      if skip is None:
+        self.kept += 1
+        yield target
+      else:
+        self.skipped.append(Skip(str(target.title), *skip))
+
+  def filterList(self, targets: Iterable[ClassificationTarget]) -> List[ClassificationTarget]:
+    return list(self(targets))
+
+  def summary(self) -> Counter:
+    """Number of targets kept and skipped for each reason"""
+    counts = Counter(s.reason for s in self.skipped)
+    counts["kept"] = self.kept
+    return counts
+
+  def writeReport(self, path: Path):
+    """Write every skipped target with its reason to a CSV for auditing"""
+    writeSkipReport(path, self.skipped)
+
+
+def writeSkipReport(path: Path, skipped: Iterable[Skip]):
+  """Write skipped targets with their reasons to a CSV, e.g. those of several filters"""
+  with open(path, "w", newline = "", encoding = "utf-8") as stream:
+    writer = csv.writer(stream)
+    writer.writerow(Skip._fields)
+    writer.writerows(skipped)
@@ -0,0 +1,142 @@
+import os
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from ai_sentiment.cache import openDatabase
+from ai_sentiment.corpus import SOURCE_CLASSIFICATIONS, engineName, sourceName
+from ai_sentiment.nlp import SentimentClassifier
+
+# Word list column of a results file for each polarity
+POLARITY_COLUMNS = { "positive": "positive_words", "negative": "negative_words"}
+
+# File attributes counts can be grouped by
+GROUPINGS = ("path", "source", "alignment", "engine")
+
+
+class FrequencyIndex:
+
+  def __init__(self, path: Path):
+    """On-disk word counts of results files, per file and polarity
+
+        Counts are stored per results file, along with its source, alignment
+        and engine, so indexing a new or changed file only replaces that
+        file's rows. Totals for any source, alignment or engine are summed in
+        sqlite when queried.
+
+        Args:
+            path: a Pathlib object or str to the sqlite file backing the index"""
+
+    self.path = Path(path)
+    self.db = openDatabase(
+        self.path,
+        "CREATE TABLE IF NOT EXISTS files "
+        "(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, source TEXT, alignment TEXT, engine TEXT);"
+        "CREATE TABLE IF NOT EXISTS counts "
+        "(path TEXT NOT NULL, polarity TEXT NOT NULL, word TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (path, polarity, word)) WITHOUT ROWID;"
+    )
+
+  def addCounts(self, path: str, counts: Dict[str, Counter], stamp = (None, None)):
+    """Replace the counts stored for a results file
+
+        Args:
+            path: Results file the counts belong to, its name gives the source and engine
+            counts: Word counts keyed by polarity
+            stamp: (mtime_ns, size) of the file the counts were taken from"""
+
+    path = str(path)
+    try:
+      source = sourceName(path)
+      alignment = SOURCE_CLASSIFICATIONS[source].name
+    except ValueError:
+      source = alignment = None
+
+    with self.db:
+      self.db.execute("DELETE FROM counts WHERE path = ?", (path,))
+      self.db.execute(
+          "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+          (path, *stamp, source, alignment, engineName(path))
+      )
+      self.db.executemany(
+          "INSERT INTO counts VALUES (?, ?, ?, ?)",
+          ((path, polarity, word, n) for polarity, words in counts.items() for word, n in words.items())
+      )
+
+  def update(self, paths: Iterable) -> int:
+    """Index results files that are new or have changed since they were last indexed
+
+    Return:
+        Number of files indexed"""
+
+    updated = 0
+    for path in map(str, paths):
+      stat = os.stat(path)
+      stamp = (stat.st_mtime_ns, stat.st_size)
+      row = self.db.execute("SELECT mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+      if row is not None and tuple(row) == stamp:
+        continue
+
+      data = SentimentClassifier.loadResults(path, columns = list(POLARITY_COLUMNS.values()))
+      counts = {
+          polarity: Counter(w for words in data[column] for w in words)
+          for polarity, column in POLARITY_COLUMNS.items()
+      }
+      self.addCounts(path, counts, stamp)
+      updated += 1
+
+    return updated
+
+  def remove(self, path: str):
+    """Drop a results file from the index"""
+    with self.db:
+      self.db.execute("DELETE FROM counts WHERE path = ?", (str(path),))
+      self.db.execute("DELETE FROM files WHERE path = ?", (str(path),))
+
+  def frequencies(
+      self,
+      polarity: str,
+      by: str = "source",
+      engine: Optional[str] = None,
+      paths: Optional[Iterable] = None
+  ) -> Dict[str, Dict[str, int]]:
+    """Word counts for one polarity, summed per value of a file attribute
+
+        Args:
+            polarity: "positive" or "negative"
+            by: Attribute to group by, one of GROUPINGS
+            engine: Only count files from this engine
+            paths: Only count these files, defaults to every indexed file
+
+        Return:
+            {group: {word: count}}, files with an unknown source are left out
+            when grouping by source or alignment"""
+
+    if by not in GROUPINGS:
+      raise ValueError(f"Can't group by {by!r}, expected one of {', '.join(GROUPINGS)}")
+
+    query = (
+        f"SELECT f.{by}, c.word, SUM(c.count) FROM counts c JOIN files f ON f.path = c.path "
+        "WHERE c.polarity = ?"
+    )
+    params = [polarity]
+    if engine is not None:
+      query += " AND f.engine = ?"
+      params.append(engine)
+    if paths is not None:
+      paths = [str(p) for p in paths]
+      query += f" AND f.path IN ({', '.join('?' * len(paths))})"
+      params.extend(paths)
+    query += f" AND f.{by} IS NOT NULL GROUP BY f.{by}, c.word"
+
+    grouped = defaultdict(dict)
+    for group, word, count in self.db.execute(query, params):
+      grouped[group][word] = count
+    return dict(grouped)
+
+  def __len__(self) -> int:
+    return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+  def close(self):
+    self.db.commit()
+    self.db.close()
@@ -0,0 +1,105 @@
+import gc
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+# spacy and the component packages are slow to import, they're loaded on first use
+if TYPE_CHECKING:
+  from spacy.language import Language
+
+# Components classifiers add on top of a base pipeline
+SENTIMENT_PIPES = ('spacytextblob', 'asent_en_v1')
+
+# Base pipelines loaded in this process, keyed by name or path
+_pipelines: Dict[str, "Language"] = {}
+_lock = Lock()
+
+
+def importSpacy():
+  """Import spacy along with the packages that register the sentiment component factories"""
+  import asent  # noqa: F401, registers the asent_en_v1 factory
+  import spacy
+  from spacytextblob.spacytextblob import SpacyTextBlob  # noqa: F401, registers the spacytextblob factory
+
+  return spacy
+
+
+def loadPipeline(pipeline = "en_core_web_trf") -> "Language":
+  """Return the process-wide instance of a base pipeline, loading it on first use
+
+    The returned pipeline is shared by every caller, so it must not be
+    modified. Classifiers run their sentiment components separately on the
+    Docs it produces. Snapshots from compilePipeline already contain those
+    components, they are loaded disabled so that classifiers can pick them
+    up with get_pipe instead of constructing them again.
+
+    Args:
+        pipeline: Name or path of the spaCy pipeline, or of a snapshot"""
+
+  key = str(pipeline)
+  with _lock:
+    if key not in _pipelines:
+      nlp = importSpacy().load(pipeline)
+      for name in SENTIMENT_PIPES:
+        if name in nlp.pipe_names:
+          nlp.disable_pipe(name)
+      _pipelines[key] = nlp
+    return _pipelines[key]
+
+
+def compilePipeline(
+    output_dir: Path, pipeline = "en_core_web_trf", sentiment_pipes: Sequence[str] = SENTIMENT_PIPES
+):
+  """Write a fully configured pipeline to a local directory for fast cold starts
+
+    Loads the base pipeline, adds the sentiment components and serialises the
+    result with Language.to_disk. Pass output_dir as the pipeline of any
+    classifier to load it. Re-run this after upgrading the model or any of the
+    component packages.
+
+    Args:
+        output_dir: a Pathlib object or str to the snapshot directory
+        pipeline: Name or path of the base spaCy pipeline
+        sentiment_pipes: Components to add on top of the base pipeline
+
+    Return:
+        Path to the snapshot"""
+
+  output_dir = Path(output_dir)
+  nlp = importSpacy().load(pipeline)
+  for name in sentiment_pipes:
+    nlp.add_pipe(name)
+
+  nlp.to_disk(output_dir)
+  return output_dir
+
+
+def loadedPipelines() -> List[str]:
+  """Names of the pipelines currently held by the registry"""
+  return list(_pipelines)
+
+
+def releasePipeline(pipeline = None):
+  """Drop the registry's reference to a pipeline and free what memory we can
+
+    Classifiers still holding the pipeline keep it alive until they are
+    deleted. The next loadPipeline call for it loads a fresh copy.
+
+    Args:
+        pipeline: Name or path of the pipeline to release, releases every
+            pipeline if None"""
+
+  with _lock:
+    if pipeline is None:
+      _pipelines.clear()
+    else:
+      _pipelines.pop(str(pipeline), None)
+
+  gc.collect()
+
+  try:
+    import torch
+    if torch.cuda.is_available():
+      torch.cuda.empty_cache()
+  except ImportError:
+    pass
@@ -1,30 +1,225 @@
+import json
 import pickle
+from dataclasses import replace
+from importlib.metadata import PackageNotFoundError, version
+from itertools import islice
 from pathlib import Path
-from typing import List
-
-import asent
-import pandas as pd
-import spacy
-# from spacy import en_core_web_trf
-from spacytextblob.spacytextblob import SpacyTextBlob
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple
 
+from ai_sentiment.cache import ResultCache
 from ai_sentiment.data import ClassificationResult, ClassificationTarget
+from ai_sentiment.docstore import DocStore
+from ai_sentiment.models import loadPipeline
+from ai_sentiment.results import (
+    COUNT_COLUMNS,
+    LIST_COLUMNS,
+    RESULT_COLUMNS,
+    parseListCell,
+    resultRow,
+    wordCount,
+    writeParquet,
+    writeResultFiles,
+)
+
+# pandas is only needed for result I/O, it's imported there to keep this module quick to import
+if TYPE_CHECKING:
+  import pandas as pd
+
+# Number of nlp.pipe batches read ahead and sorted by length at a time
+BUCKET_BATCHES = 8
+
+# Bump when the fields of results change, so that cached results are recomputed
+RESULT_FORMAT = 4
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+  """Yield successive lists of at most size elements from iterable"""
+  iterator = iter(iterable)
+  while batch := list(islice(iterator, size)):
+    yield batch
+
+
+def textblobResult(target: ClassificationTarget, doc) -> ClassificationResult:
+  """Build a classification from the spacytextblob annotations on doc"""
+
+  # Taken from https://importsem.com/evaluate-sentiment-analysis-in-bulk-with-spacy-and-python/
+  sentiment = doc._.blob.polarity
+  sentiment = round(sentiment, 2)
+
+  # Get classified words
+  positive_words = []
+  negative_words = []
+  word_scores = []
+
+  for x in doc._.blob.sentiment_assessments.assessments:
+    if x[1] > 0:
+      positive_words.append(x[0][0])
+    elif x[1] < 0:
+      negative_words.append(x[0][0])
+    else:
+      pass
+
+    word_scores.append((x[0][0], round(x[1], 2)))
+
+  # Return classification
+  return ClassificationResult(
+      target, sentiment, positive_words, negative_words, word_scores, wordCount(doc.text), len(doc.text)
+  )
+
+
+def asentResult(target: ClassificationTarget, doc) -> ClassificationResult:
+  """Build a classification from the asent annotations on doc"""
+
+  # TODO: Use Asent's visualizers
+  # TODO: Document and sentence-level polarity
+  sentiment = doc._.polarity.compound
+  sentiment = round(sentiment, 2)
+
+  # Get classified words
+  positive_words = []
+  negative_words = []
+  word_scores = []
+
+  for x in doc:
+    x_pol = x._.polarity
+    if x_pol.polarity > 0:
+      positive_words.append(x.text)
+    elif x_pol.polarity < 0:
+      negative_words.append(x.text)
+    else:
+      continue
+
+    word_scores.append((x.text, round(x_pol.polarity, 2)))
+
+  # Return classification
+  return ClassificationResult(
+      target, sentiment, positive_words, negative_words, word_scores, wordCount(doc.text), len(doc.text)
+  )
+
+
+def withTarget(result, target: ClassificationTarget):
+  """Rebind the target of a result, or of each result in a tuple from DualSentimentClassifier"""
+  if isinstance(result, tuple):
+    return tuple(replace(r, target = target) for r in result)
+  return replace(result, target = target)
+
+
+def packageVersion(package: str) -> str:
+  try:
+    return version(package)
+  except PackageNotFoundError:
+    return None
 
 
 class SentimentClassifier:
 
-  def __init__(self, pipeline = "en_core_web_trf"):
+  # Components added on top of the base pipeline, in order
+  sentiment_pipes = ('spacytextblob',)
+
+  def __init__(
+      self,
+      pipeline = "en_core_web_trf",
+      batch_size = 32,
+      cache: ResultCache = None,
+      doc_store: DocStore = None
+  ):
     """Init for NLP sentiment classifier
 
         Ensure that you've downloaded a model! Here, we default to the
-        transformer model, https://spacy.io/models/en#en_core_web_trf"""
+        transformer model, https://spacy.io/models/en#en_core_web_trf
 
-    self.nlp = spacy.load(pipeline)
-
-    # self.nlp = en_core_web_trf.load()
-
-    # TODO Check that this doesn't block the transformer model from running
-    self.nlp.add_pipe('spacytextblob')
+        Args:
+            pipeline: Name or path of the spaCy pipeline to load
+            batch_size: Default number of documents per nlp.pipe batch
+            cache: Optional ResultCache consulted before running the pipeline
+            doc_store: Optional DocStore of processed Docs. Stored Docs skip
+                the base pipeline and new ones are added to the store."""
+
+    # Base pipeline is shared with every other classifier in this process, see ai_sentiment.models
+    self.nlp = loadPipeline(pipeline)
+    self.batch_size = batch_size
+    self.cache = cache
+    self.doc_store = doc_store
+
+    # Sentiment components are owned by this classifier and run on the base pipeline's Docs,
+    # so the shared pipeline is never modified. Snapshots carry them pre-built but disabled.
+    self.components = [
+        self.nlp.get_pipe(name) if name in self.nlp.component_names else self.nlp.create_pipe(name)
+        for name in self.sentiment_pipes
+    ]
+
+    self.cache_namespace = self.cacheNamespace()
+    self.doc_namespace = self.docNamespace()
+
+  def cacheNamespace(self) -> str:
+    """Describe everything besides the body that determines this classifier's output"""
+
+    meta = self.nlp.meta
+    namespace = {
+        "classifier": type(self).__name__,
+        "result_format": RESULT_FORMAT,
+        "model": f"{meta.get('lang')}_{meta.get('name')}",
+        "model_version": meta.get("version"),
+        "pipes": self.nlp.pipe_names + list(self.sentiment_pipes),
+        "packages": {
+            p: packageVersion(p)
+            for p in ("spacy", "spacy-transformers", "spacytextblob", "textblob", "asent")
+        },
+    }
+    return json.dumps(namespace, sort_keys = True)
+
+  def docNamespace(self) -> str:
+    """Describe the base pipeline, whose annotations are shared by every classifier"""
+
+    meta = self.nlp.meta
+    namespace = {
+        "model": f"{meta.get('lang')}_{meta.get('name')}",
+        "model_version": meta.get("version"),
+        "pipes": self.nlp.pipe_names,
+        "packages": {
+            p: packageVersion(p)
+            for p in ("spacy", "spacy-transformers")
+        },
+    }
+    return json.dumps(namespace, sort_keys = True)
+
+  def runComponents(self, doc):
+    """Run this classifier's sentiment components on a Doc from the base pipeline"""
+    for component in self.components:
+      doc = component(doc)
+    return doc
+
+  def storedDoc(self, target: ClassificationTarget):
+    """Load target's Doc from the doc store and re-run the sentiment components on it
+
+        Returns None on a miss or without a doc store."""
+
+    if self.doc_store is None:
+      return None
+
+    doc = self.doc_store.get(ResultCache.key(self.doc_namespace, target.body), self.nlp.vocab)
+    return None if doc is None else self.runComponents(doc)
+
+  def storeDoc(self, target: ClassificationTarget, doc):
+    """Add a freshly processed Doc to the doc store, if there is one"""
+
+    if self.doc_store is not None:
+      self.doc_store.put(ResultCache.key(self.doc_namespace, target.body), doc)
+
+  def cachedResult(self, target: ClassificationTarget):
+    """Look up target in the result cache, returns None on a miss or without a cache"""
+
+    if self.cache is None:
+      return None
+
+    cached = self.cache.get(ResultCache.key(self.cache_namespace, target.body))
+    return None if cached is None else withTarget(cached, target)
+
+  def cacheResult(self, target: ClassificationTarget, result):
+    """Store a fresh result in the result cache, if there is one"""
+
+    if self.cache is not None:
+      self.cache.put(ResultCache.key(self.cache_namespace, target.body), withTarget(result, None))
 
   def process(self, target: ClassificationTarget) -> ClassificationResult:
     """Call NLP pipeline on target
@@ -35,65 +230,126 @@ class SentimentClassifier:
         Return:
             Result of classification!"""
 
-    # Process!
-    # Taken from https://importsem.com/evaluate-sentiment-analysis-in-bulk-with-spacy-and-python/
-    doc = self.nlp(target.body)
-    sentiment = doc._.blob.polarity
-    sentiment = round(sentiment, 2)
-
-    # Get classified words
-    positive_words = []
-    negative_words = []
-    word_scores = []
-
-    for x in doc._.blob.sentiment_assessments.assessments:
-      if x[1] > 0:
-        positive_words.append(x[0][0])
-      elif x[1] < 0:
-        negative_words.append(x[0][0])
-      else:
-        pass
+    result = self.cachedResult(target)
+    if result is None:
+      doc = self.storedDoc(target)
+      if doc is None:
+        doc = self.nlp(target.body)
+        self.storeDoc(target, doc)
+        doc = self.runComponents(doc)
+
+      result = self.processDoc(target, doc)
+      self.cacheResult(target, result)
+
+    return result
 
-      word_scores.append((x[0][0], round(x[1], 2)))
+  def processDoc(self, target: ClassificationTarget, doc) -> ClassificationResult:
+    """Extract a classification from a document the pipeline has already processed
+
+        Args:
+            target: Item the document was created from
+            doc: spaCy Doc for target.body, after runComponents
+
+        Return:
+            Result of classification!"""
+
+    return textblobResult(target, doc)
+
+  def processIter(
+      self,
+      targets: Iterable[ClassificationTarget],
+      batch_size: int = None,
+      bucket_size: int = None
+  ) -> Iterator[ClassificationResult]:
+    """Calls NLP pipeline on a stream of targets, batching through nlp.pipe.
+
+        Targets are read in buckets, sorted by body length within each bucket
+        so that every nlp.pipe batch holds similarly sized documents (less
+        padding in the transformer), then yielded back in input order.
+
+        Args:
+            targets: An iterable of items to classify
+            batch_size: Documents per nlp.pipe batch, defaults to self.batch_size
+            bucket_size: Targets read ahead and length-sorted at a time,
+                defaults to BUCKET_BATCHES batches
+
+        Return:
+            Iterator over results, in the same order as targets"""
 
-    # Return classification
-    return ClassificationResult(target, sentiment, positive_words, negative_words, word_scores)
+    batch_size = batch_size or self.batch_size
+    bucket_size = bucket_size or batch_size * BUCKET_BATCHES
 
-  def processList(self, targets: List[ClassificationTarget]) -> List[ClassificationResult]:
+    for bucket in batched(targets, bucket_size):
+      yield from self.processBucket(bucket, batch_size)
+
+  def processBucket(self, bucket: List[ClassificationTarget], batch_size: int) -> List[ClassificationResult]:
+    """Run one length-sorted bucket of targets through nlp.pipe, preserving input order
+
+        Targets found in the result cache skip the pipeline entirely, and
+        targets found in the doc store only re-run the sentiment components.
+        To re-run extraction after changing it, use a doc store without the
+        result cache."""
+
+    results = [self.cachedResult(t) for t in bucket]
+
+    pending = []
+    for i, result in enumerate(results):
+      if result is None:
+        doc = self.storedDoc(bucket[i])
+        if doc is None:
+          pending.append(i)
+        else:
+          results[i] = self.processDoc(bucket[i], doc)
+          self.cacheResult(bucket[i], results[i])
+
+    order = sorted(pending, key = lambda i: len(bucket[i].body))
+    docs = self.nlp.pipe((bucket[i].body for i in order), batch_size = batch_size)
+
+    for i, doc in zip(order, docs):
+      self.storeDoc(bucket[i], doc)
+      results[i] = self.processDoc(bucket[i], self.runComponents(doc))
+      self.cacheResult(bucket[i], results[i])
+
+    return results
+
+  def processList(self,
+                  targets: List[ClassificationTarget],
+                  batch_size: int = None) -> List[ClassificationResult]:
     """Calls NLP pipeline on a list of targets.
 
         Args:
             targets: A list of items to classify, each element is a
                 ClassificationTarget data class
+            batch_size: Documents per nlp.pipe batch, defaults to self.batch_size
 
         Return:
             List of results from classification"""
 
-    return [self.process(t) for t in targets]
+    return list(self.processIter(targets, batch_size))
 
   @staticmethod
-  def dumpResults(filename: str, results: List[ClassificationResult], serialize = False):
-    """Static method that dumps a list of results to a CSV file
+  def dumpResults(filename: str, results: List[ClassificationResult], serialize = False, format = "csv"):
+    """Static method that dumps a list of results to a CSV or Parquet file
 
         Args:
-            filename: String filename for output csv, excludes file extension
+            filename: String filename for output file, excludes file extension
             results: List of results from classification
             serialize: A boolean flag to enable outputting a
                 serialized dataframe as well
+            format: "csv", or "parquet" for typed list columns (requires pyarrow)
 
         """
 
     filepath = Path(filename)
 
-    # Create empty data frame
-    df = pd.DataFrame()
+    if format == "parquet":
+      writeParquet(filepath.with_suffix(".parquet"), results)
+      return
+
+    import pandas as pd
 
-    df["titles"] = [r.target.title for r in results]
-    df["body_contents"] = [r.target.body for r in results]
-    df["tags"] = [r.target.tags for r in results]
-    df["sentiment_score"] = [r.sentiment_score for r in results]
-    df["positive_words"] = [r.positive_words for r in results]
-    df["negative_words"] = [r.negative_words for r in results]
+    # One row per result
+    df = pd.DataFrame([resultRow(r) for r in results], columns = RESULT_COLUMNS)
 
     df.to_csv(filepath.with_suffix(".csv"))
 
@@ -102,54 +358,164 @@ class SentimentClassifier:
         pickle.dump(df, f)
 
   @staticmethod
-  def loadResults(filename: str):
+  def loadResults(filename: str, columns: List[str] = None) -> "pd.DataFrame":
+    """Static method that loads a results file written by dumpResults
+
+        List columns come back as lists (arrays for Parquet) rather than strings.
+        Files written before a list column existed get it empty. Files written
+        before token_count and char_count existed only get them when columns
+        asks for them, counted from body_contents in memory, the file itself
+        is left as it is. scripts/backfill_counts.py stores them for good.
+
+        Args:
+            filename: Path to a .csv or .parquet results file
+            columns: Only load these columns, e.g. leave out body_contents
+
+        Return:
+            Data frame of results"""
+
     if type(filename) == str:
       filename = Path(filename)
-    df = pd.read_csv(filename)
+
+    if filename.suffix == ".parquet":
+      import pyarrow.parquet as pq
+      names = pq.read_schema(filename).names
+      df = pq.read_table(
+          filename, columns = [c for c in columns if c in names] if columns else None
+      ).to_pandas()
+    else:
+      import pandas as pd
+
+      converters = { c: parseListCell for c in LIST_COLUMNS if columns is None or c in columns }
+      df = pd.read_csv(
+          filename, usecols = (lambda c: c in columns) if columns else None, converters = converters
+      )
+
+    missing = [c for c in columns or RESULT_COLUMNS if c not in df.columns]
+    for column in missing:
+      if column in LIST_COLUMNS:
+        df[column] = [[] for _ in range(len(df))]
+      elif column not in COUNT_COLUMNS and columns is not None:
+        raise ValueError(f"{filename} has no column {column!r}")
+
+    # Counting reads every body, so it's only done for callers that ask for counts
+    if columns is not None and any(c in COUNT_COLUMNS for c in missing):
+      from ai_sentiment.stats import bodyCounts
+
+      if "body_contents" in df.columns:
+        bodies = df["body_contents"]
+      else:
+        bodies = SentimentClassifier.loadResults(filename, ["body_contents"])["body_contents"]
+      counts = bodyCounts(bodies)
+      for column in COUNT_COLUMNS:
+        if column in missing:
+          df[column] = counts[column]
+
     return df
 
   @staticmethod
-  def combineResults(filenames: List[str], write_filename: str):
+  def combineResults(filenames: List[str], write_filename: str, format = "csv"):
+    """Static method that merges several results files into one
+
+        Parquet files are concatenated as an Arrow dataset without
+        converting through pandas.
+
+        Args:
+            filenames: Results files to merge, all in the given format
+            write_filename: String filename for merged file, excludes file extension
+            format: Either "csv" or "parquet", the format of every file"""
+
+    if format == "parquet":
+      import pyarrow.dataset as ds
+      import pyarrow.parquet as pq
+      table = ds.dataset([str(f) for f in filenames], format = "parquet").to_table()
+      pq.write_table(table, Path(write_filename).with_suffix(".parquet"))
+      return
+
+    import pandas as pd
+
     dfs = [SentimentClassifier.loadResults(f) for f in filenames]
     df = pd.concat(dfs)
 
     df.to_csv(Path(write_filename).with_suffix(".csv"))
 
-  def processListToFile(self, filename: str, targets: List[ClassificationTarget]):
+  def processListToFile(
+      self,
+      filename: str,
+      targets: Iterable[ClassificationTarget],
+      checkpoint_every: int = 100,
+      batch_size: int = None
+  ):
     """Calls NLP pipeline on a list of targets and dump results to a CSV file
 
+        Rows are appended as results complete, see processToFiles.
+
         Args:
             filename: String filename for output csv, exclues file extension
             targets: A list of items to classify, each element is a ClassificationTarget data class
+            checkpoint_every: Number of results between checkpoints
+            batch_size: Documents per nlp.pipe batch, defaults to self.batch_size
             """
 
-    results = self.processList(targets)
-    self.dumpResults(filename, results)
+    self.processToFiles([filename], targets, checkpoint_every, batch_size)
+
+  def processToFiles(
+      self,
+      filenames: List[str],
+      targets: Iterable[ClassificationTarget],
+      checkpoint_every: int = 100,
+      batch_size: int = None
+  ):
+    """Stream targets through processIter, appending results to CSV files as they complete
+
+        Every checkpoint_every results the files are flushed and the finished
+        target ids are recorded in a checkpoint next to the first file. If a
+        run is interrupted, calling this again with the same filenames skips
+        finished targets and continues the files from the last checkpoint.
+        The checkpoint is removed once every target has been written, see
+        ai_sentiment.results.writeResultFiles.
+
+        Args:
+            filenames: One filename per result produced by processDoc
+                (two for DualSentimentClassifier), excluding file extension
+            targets: An iterable of items to classify
+            checkpoint_every: Number of results between checkpoints
+            batch_size: Documents per nlp.pipe batch, defaults to self.batch_size"""
+
+    writeResultFiles(
+        filenames, targets, lambda remaining: self.processIter(remaining, batch_size), checkpoint_every
+    )
 
 
 class AsentSentimentClassifier(SentimentClassifier):
 
-  def __init__(self):
-    self.nlp = spacy.load("en_core_web_trf")
-    self.nlp.add_pipe('asent_en_v1')
+  sentiment_pipes = ('asent_en_v1',)
 
-  def process(self, target: ClassificationTarget) -> ClassificationResult:
-    # TODO: Use Asent's visualizers
-    # TODO: Document and sentence-level polarity
-    doc = self.nlp(target.body)
-    sentiment = doc._.polarity.compound
-    sentiment = round(sentiment, 2)
-
-    # Get classified words
-    positive_words = []
-    negative_words = []
-
-    for x in doc:
-      x_pol = x._.polarity
-      if x_pol.polarity > 0:
-        positive_words.append(x.text)
-      elif x_pol.polarity < 0:
-        negative_words.append(x.text)
-
-    # Return classification
-    return ClassificationResult(target, sentiment, positive_words, negative_words)
+  def processDoc(self, target: ClassificationTarget, doc) -> ClassificationResult:
+    return asentResult(target, doc)
+
+
+class DualSentimentClassifier(SentimentClassifier):
+  """Runs both spacytextblob and asent on one parse
+
+    Each body goes through the transformer once, and both engines read
+    their scores off the same Doc. Results are (textblob, asent) pairs."""
+
+  sentiment_pipes = ('spacytextblob', 'asent_en_v1')
+
+  def processDoc(self, target: ClassificationTarget,
+                 doc) -> Tuple[ClassificationResult, ClassificationResult]:
+    return textblobResult(target, doc), asentResult(target, doc)
+
+  def processListToFiles(
+      self, textblob_filename: str, asent_filename: str, targets: List[ClassificationTarget]
+  ):
+    """Calls NLP pipeline on a list of targets and dump each engine's results to its own CSV file
+
+        Args:
+            textblob_filename: String filename for textblob output csv, excludes file extension
+            asent_filename: String filename for asent output csv, excludes file extension
+            targets: A list of items to classify, each element is a ClassificationTarget data class
+            """
+
+    self.processToFiles([textblob_filename, asent_filename], targets)
@@ -0,0 +1,208 @@
+import math
+import os
+from collections import deque
+from collections.abc import Sized
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterable, Iterator, List
+
+from ai_sentiment.data import ClassificationResult, ClassificationTarget
+from ai_sentiment.nlp import BUCKET_BATCHES, SentimentClassifier, batched
+from ai_sentiment.results import writeResultFiles
+
+# Environment variables read by the BLAS/OpenMP runtimes underneath numpy and torch
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+# Shards queued or running per worker, more are only read from the targets as results are consumed
+SHARDS_PER_WORKER = 2
+
+# Classifier owned by the current worker process, created once by _initWorker
+_worker_classifier = None
+
+# Why _worker_classifier couldn't be created, reported by _processShard
+_worker_error = None
+
+
+class WorkerInitError(RuntimeError):
+  """A worker process couldn't create its classifier, e.g. the spaCy pipeline isn't installed"""
+
+
+def _initWorker(classifier_cls: type, classifier_kwargs: dict, threads: int):
+  """Process pool initializer: cap intra-op threads, then load the pipeline once"""
+  global _worker_classifier, _worker_error
+
+  for var in THREAD_ENV_VARS:
+    os.environ[var] = str(threads)
+
+  try:
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+  except ImportError:
+    pass
+
+  # An initializer that raises leaves the pool broken without saying why, so the error is
+  # kept and raised from every shard instead
+  try:
+    _worker_classifier = classifier_cls(**classifier_kwargs)
+  except Exception as e:
+    _worker_error = f"{classifier_cls.__name__} could not be created in a worker: {type(e).__name__}: {e}"
+
+
+def _processShard(shard: List[ClassificationTarget]) -> list:
+  """Classify one shard in a worker process"""
+  if _worker_classifier is None:
+    raise WorkerInitError(_worker_error)
+  return _worker_classifier.processList(shard)
+
+
+class ClassifierPool:
+
+  def __init__(
+      self,
+      classifier_cls: type = SentimentClassifier,
+      workers: int = None,
+      threads_per_worker: int = None,
+      **classifier_kwargs
+  ):
+    """Pool of worker processes that each load a classifier once, for classifying several lists
+
+        Workers are started as work arrives and kept until the pool is
+        closed, so a script classifying many files pays for loading the
+        pipeline once per worker rather than once per file. Use it as a
+        context manager, or call close().
+
+        Args:
+            classifier_cls: SentimentClassifier subclass each worker constructs
+            workers: Number of worker processes, defaults to the number of CPUs
+            threads_per_worker: torch/BLAS threads per worker, defaults to an even
+                split of the CPUs so that workers don't oversubscribe them
+            classifier_kwargs: Passed to classifier_cls in every worker"""
+
+    cpus = os.cpu_count() or 1
+    self.workers = workers or cpus
+    self.bucket_size = classifier_kwargs.get("batch_size", 32) * BUCKET_BATCHES
+    threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+
+    # Spawn rather than fork so workers don't inherit the parent's torch thread pools
+    self.executor = ProcessPoolExecutor(
+        max_workers = self.workers,
+        mp_context = get_context("spawn"),
+        initializer = _initWorker,
+        initargs = (classifier_cls, classifier_kwargs, threads_per_worker)
+    )
+
+  def shardSize(self, targets: int) -> int:
+    """Spread targets evenly over the workers, at most a bucket per shard"""
+    return max(1, min(self.bucket_size, math.ceil(targets / self.workers)))
+
+  def process(self,
+              targets: Iterable[ClassificationTarget],
+              shard_size: int = None) -> Iterator[ClassificationResult]:
+    """Classify targets across the workers
+
+        Targets are split into shards, results are yielded as shards
+        complete, in the same order as targets. At most SHARDS_PER_WORKER
+        shards per worker are in flight, so targets can be a stream that
+        is only read as results are consumed.
+
+        Args:
+            targets: An iterable of items to classify
+            shard_size: Targets sent to a worker at a time, defaults to an
+                even split of a list across the workers, capped at
+                BUCKET_BATCHES batches of the classifier's batch size
+
+        Return:
+            Iterator over results, in the same order as targets
+
+        Raises:
+            WorkerInitError: If the workers couldn't create their classifier"""
+
+    if shard_size is None:
+      shard_size = self.shardSize(len(targets)) if isinstance(targets, Sized) else self.bucket_size
+
+    pending = deque()
+    try:
+      for shard in batched(targets, shard_size):
+        pending.append(self.executor.submit(_processShard, shard))
+        if len(pending) >= self.workers * SHARDS_PER_WORKER:
+          yield from pending.popleft().result()
+      while pending:
+        yield from pending.popleft().result()
+    finally:
+      # A consumer that stops early doesn't wait for shards it won't read
+      for future in pending:
+        future.cancel()
+
+  def processToFiles(
+      self,
+      filenames: List[str],
+      targets: Iterable[ClassificationTarget],
+      checkpoint_every: int = 100,
+      shard_size: int = None
+  ):
+    """Classify targets across the workers, appending results to CSV files as they complete
+
+        Works like SentimentClassifier.processToFiles, including resuming an
+        interrupted run from its checkpoint.
+
+        Args:
+            filenames: One filename per result the classifier produces for a
+                target, excluding file extension
+            targets: An iterable of items to classify
+            checkpoint_every: Number of results between checkpoints
+            shard_size: Targets sent to a worker at a time, see process"""
+
+    # Shards are sized from the whole list, before finished targets are filtered out
+    if shard_size is None and isinstance(targets, Sized):
+      shard_size = self.shardSize(len(targets))
+
+    writeResultFiles(
+        filenames, targets, lambda remaining: self.process(remaining, shard_size), checkpoint_every
+    )
+
+  def close(self):
+    self.executor.shutdown()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def processParallel(
+    targets: List[ClassificationTarget],
+    classifier_cls: type = SentimentClassifier,
+    workers: int = None,
+    shard_size: int = None,
+    threads_per_worker: int = None,
+    **classifier_kwargs
+) -> Iterator[ClassificationResult]:
+  """Classify targets across a pool of worker processes.
+
+    Targets are split into shards that are classified by workers which each
+    load the pipeline once. Results are yielded as shards complete, in the
+    same order as targets. To classify several lists with the same workers,
+    use a ClassifierPool.
+
+    Args:
+        targets: A list of items to classify
+        classifier_cls: SentimentClassifier subclass each worker constructs
+        workers: Number of worker processes, defaults to the number of CPUs
+        shard_size: Targets sent to a worker at a time, see ClassifierPool.process
+        threads_per_worker: torch/BLAS threads per worker, defaults to an even
+            split of the CPUs so that workers don't oversubscribe them
+        classifier_kwargs: Passed to classifier_cls in every worker
+
+    Return:
+        Iterator over results, in the same order as targets"""
+
+  with ClassifierPool(classifier_cls, workers, threads_per_worker, **classifier_kwargs) as pool:
+    yield from pool.process(targets, shard_size)
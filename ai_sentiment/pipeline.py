@@ -0,0 +1,123 @@
+import threading
+from queue import Empty, Full, Queue
+from typing import Iterable, Iterator
+
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.filters import TargetFilter
+from ai_sentiment.nlp import BUCKET_BATCHES, SentimentClassifier
+from ai_sentiment.scraper import Scraper
+
+# Seconds a blocked producer or consumer waits before checking whether the run was abandoned
+POLL_INTERVAL = 0.1
+
+
+class _Done:
+  """Marker a producer puts on the queue once its scraper is exhausted"""
+
+  def __init__(self, error: BaseException = None):
+    self.error = error
+
+
+def _produce(scraper: Scraper, out: Queue, stop: threading.Event):
+  """Producer thread: scrape targets into out, blocking while it is full"""
+
+  def put(item):
+    while not stop.is_set():
+      try:
+        out.put(item, timeout = POLL_INTERVAL)
+        return True
+      except Full:
+        continue
+    return False
+
+  try:
+    for target in scraper.scrapeIter():
+      if not put(target):
+        return
+  except BaseException as e:
+    put(_Done(e))
+  else:
+    put(_Done())
+
+
+def scrapeStream(scrapers: Iterable[Scraper], max_pending: int = 256) -> Iterator[ClassificationTarget]:
+  """Run scrapers on background threads and yield their targets as they arrive
+
+    Each scraper gets its own producer thread, so network, PDF and other
+    scraping work overlaps with whatever consumes this iterator. At most
+    max_pending targets are buffered, producers block until the consumer
+    catches up. Targets from one scraper keep their queue order, targets
+    from different scrapers are interleaved in arrival order.
+
+    Args:
+        scrapers: Scrapers with queued elements
+        max_pending: Bound on targets scraped but not yet consumed
+
+    Return:
+        Iterator over targets, re-raises the first error a scraper hits"""
+
+  scrapers = list(scrapers)
+  pending: Queue = Queue(maxsize = max_pending)
+  stop = threading.Event()
+  threads = [
+      threading.Thread(
+          target = _produce, args = (s, pending, stop), name = f"scrape-{type(s).__name__}", daemon = True
+      ) for s in scrapers
+  ]
+  for thread in threads:
+    thread.start()
+
+  running = len(threads)
+  try:
+    while running:
+      try:
+        item = pending.get(timeout = POLL_INTERVAL)
+      except Empty:
+        continue
+
+      if isinstance(item, _Done):
+        running -= 1
+        if item.error is not None:
+          raise item.error
+      else:
+        yield item
+  finally:
+    # Unblocks producers if the consumer stopped early or a scraper failed
+    stop.set()
+    for thread in threads:
+      thread.join()
+
+
+def runPipeline(
+    scrapers: Iterable[Scraper],
+    classifier: SentimentClassifier,
+    batch_size: int = None,
+    max_pending: int = None,
+    target_filter: TargetFilter = None
+) -> Iterator:
+  """Scrape and classify concurrently, classifying in batches as targets arrive
+
+    Unlike scrapeAll followed by processList, classification starts as soon
+    as the first bucket of targets is scraped, so a run takes about as long
+    as the slower of the two stages rather than their sum.
+
+    Args:
+        scrapers: Scrapers with queued elements
+        classifier: Classifier whose processIter consumes the targets
+        batch_size: Documents per nlp.pipe batch, defaults to classifier.batch_size
+        max_pending: Bound on targets waiting for the classifier, defaults to
+            two buckets so scraping can run one bucket ahead
+        target_filter: Optional TargetFilter applied to targets before they
+            reach the classifier, skips are recorded on it
+
+    Return:
+        Iterator over the classifier's results, in the order targets were scraped"""
+
+  batch_size = batch_size or classifier.batch_size
+  max_pending = max_pending or 2 * batch_size * BUCKET_BATCHES
+  stream = scrapeStream(scrapers, max_pending)
+  targets = target_filter(stream) if target_filter is not None else stream
+  try:
+    yield from classifier.processIter(targets, batch_size)
+  finally:
+    stream.close()
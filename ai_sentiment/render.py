@@ -0,0 +1,163 @@
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+from typing import Callable, Iterable, List, NamedTuple
+
+from ai_sentiment.corpus import SOURCE_CLASSIFICATIONS, Classification
+
+# Hashes of the inputs each output was last rendered from
+DEFAULT_MANIFEST = Path(".corpus_cache/render_manifest.json")
+
+
+class RenderJob(NamedTuple):
+  """One output file, drawn by calling render(*args, path = output, **kwargs)
+
+    render must be importable by worker processes, i.e. a module-level
+    function in a library module rather than in a script."""
+  render: Callable
+  output: str
+  args: tuple = ()
+  kwargs: dict = {}
+
+
+def contentHash(value) -> bytes:
+  """Digest of a render input, data frames are hashed by content rather than pickled bytes"""
+  import pandas as pd
+
+  if isinstance(value, pd.DataFrame):
+    rows = pd.util.hash_pandas_object(value, index = True).to_numpy().tobytes()
+    return sha256(pickle.dumps((list(value.columns), [str(t) for t in value.dtypes])) + rows).digest()
+  if isinstance(value, (list, tuple)):
+    return sha256(b"".join(contentHash(v) for v in value)).digest()
+  if isinstance(value, dict):
+    return sha256(b"".join(contentHash(k) + contentHash(v) for k, v in value.items())).digest()
+  return sha256(pickle.dumps(value, protocol = 4)).digest()
+
+
+def jobKey(job: RenderJob) -> str:
+  """Changes whenever the renderer, its data or its parameters do"""
+  renderer = f"{job.render.__module__}.{job.render.__qualname__}".encode()
+  return sha256(renderer + contentHash(job.args) + contentHash(job.kwargs)).hexdigest()
+
+
+def _initRenderer():
+  """Process pool initializer: draw off-screen"""
+  import matplotlib
+  matplotlib.use("Agg", force = True)
+
+
+def _renderJob(job: RenderJob) -> str:
+  job.render(*job.args, path = job.output, **job.kwargs)
+  return job.output
+
+
+def renderAll(jobs: Iterable[RenderJob], workers: int = None, manifest: Path = DEFAULT_MANIFEST) -> List[str]:
+  """Render jobs across a pool of worker processes, skipping outputs that are up to date
+
+    An output is redrawn only if it's missing or its job's inputs hash to a
+    different key than when it was last rendered. Keys are kept in a JSON
+    manifest, updated as each job finishes so an interrupted run keeps what
+    it completed.
+
+    Workers are forked where the platform allows it, so plotting scripts
+    don't need a __main__ guard. Elsewhere they are spawned, which re-imports
+    the calling script.
+
+    Args:
+        jobs: Figures to render
+        workers: Number of worker processes, defaults to the number of CPUs
+        manifest: a Pathlib object or str to the manifest file
+
+    Return:
+        Outputs that were rendered"""
+
+  manifest = Path(manifest)
+  keys = json.loads(manifest.read_text()) if manifest.exists() else {}
+
+  stale = []
+  for job in jobs:
+    key = jobKey(job)
+    if keys.get(str(job.output)) != key or not os.path.exists(job.output):
+      stale.append((job, key))
+
+  if not stale:
+    return []
+
+  def save():
+    manifest.parent.mkdir(parents = True, exist_ok = True)
+    partial = manifest.with_suffix(".partial")
+    partial.write_text(json.dumps(keys, indent = 1, sort_keys = True))
+    os.replace(partial, manifest)
+
+  method = "fork" if "fork" in get_all_start_methods() else "spawn"
+  rendered = []
+  with ProcessPoolExecutor(max_workers = workers,
+                           mp_context = get_context(method),
+                           initializer = _initRenderer) as executor:
+    try:
+      for (job, key), output in zip(stale, executor.map(_renderJob, [job for job, _ in stale])):
+        keys[str(output)] = key
+        rendered.append(output)
+    finally:
+      save()
+
+  return rendered
+
+
+def wordcloudFigure(frequencies: dict, path: str, width: int = 800, height: int = 400):
+  """Wordcloud of the most frequent words, sized by count"""
+  from wordcloud import WordCloud
+
+  wordcloud = WordCloud(
+      max_font_size = 100,
+      max_words = 100,
+      background_color = "white",
+      scale = 2,
+      width = width,
+      height = height
+  ).generate_from_frequencies(frequencies)
+  wordcloud.to_file(path)
+
+
+def boxplotFigure(results, title: str, path: str):
+  """Sentiment score distribution of each source, coloured by alignment"""
+  import matplotlib.pyplot as plt
+  import seaborn as sns
+
+  fig, ax = plt.subplots()
+  ax.set_title(title)
+  sns.boxplot(
+      data = results,
+      x = "sentiment_score",
+      y = "source",
+      hue = "alignment",
+      palette = {c._name_: c._value_
+                 for c in Classification},
+      order = list(SOURCE_CLASSIFICATIONS.keys()),
+      ax = ax
+  )
+  fig.savefig(path)
+  plt.close(fig)
+
+
+def wordScatterFigure(
+    stats, title: str, path: str, color: str = Classification.CENTER.value, labels: int = 15
+):
+  """Mean sentiment score of each word against how often it occurs, labelling the most frequent words"""
+  import matplotlib.pyplot as plt
+
+  fig, ax = plt.subplots(figsize = (12, 8), layout = "constrained")
+  ax.scatter(stats["count"], stats["mean"], s = 10, alpha = 0.5, color = color)
+  for row in stats.nlargest(labels, "count").itertuples():
+    ax.annotate(row.word, (row.count, row.mean), fontsize = 8)
+
+  ax.set_xscale("log")
+  ax.set_xlabel("Occurrences")
+  ax.set_ylabel("Mean sentiment score")
+  ax.set_title(title)
+  fig.savefig(path)
+  plt.close(fig)
@@ -0,0 +1,291 @@
+import csv
+import json
+import os
+import re
+from ast import literal_eval
+from collections import Counter
+from hashlib import sha1
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+
+from ai_sentiment.data import ClassificationResult, ClassificationTarget
+
+# Columns written for every result, after the leading index column pandas adds
+RESULT_COLUMNS = [
+    "titles",
+    "body_contents",
+    "tags",
+    "sentiment_score",
+    "positive_words",
+    "negative_words",
+    "word_scores",
+    "token_count",
+    "char_count"
+]
+
+# Columns holding lists, stored as stringified Python lists in CSV files
+LIST_COLUMNS = ["tags", "positive_words", "negative_words", "word_scores"]
+
+# Body length columns, see ai_sentiment.stats.backfillCounts for files written before they existed
+COUNT_COLUMNS = ["token_count", "char_count"]
+
+# What token_count counts, the same word definition the corpus stats have always used
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def wordCount(text: str) -> int:
+  """Number of WORD_PATTERN matches in text"""
+  return len(WORD_PATTERN.findall(text))
+
+
+def resultRow(result: ClassificationResult) -> list:
+  """Values of RESULT_COLUMNS for one result"""
+  return [
+      result.target.title,
+      result.target.body,
+      result.target.tags,
+      result.sentiment_score,
+      result.positive_words,
+      result.negative_words,
+      result.word_scores,
+      result.token_count,
+      result.char_count,
+  ]
+
+
+def tagList(tags) -> List[str]:
+  """Scrapers produce tags as a list or a single string, normalise them to a list of strings"""
+  if tags is None:
+    return []
+  if isinstance(tags, str):
+    return [tags]
+  return [str(t) for t in tags if t is not None]
+
+
+def parseListCell(cell) -> list:
+  """Parse a stringified list from a results CSV without eval"""
+  if not isinstance(cell, str) or not cell:
+    return []
+  if cell.startswith("["):
+    return literal_eval(cell)
+  # Web scraper tags were written as plain strings
+  return [cell]
+
+
+def resultSchema():
+  """Arrow schema for result files, with native list columns"""
+  import pyarrow as pa
+
+  return pa.schema([
+      ("titles", pa.string()),
+      ("body_contents", pa.string()),
+      ("tags", pa.list_(pa.string())),
+      ("sentiment_score", pa.float64()),
+      ("positive_words", pa.list_(pa.string())),
+      ("negative_words", pa.list_(pa.string())),
+      ("word_scores", pa.list_(pa.struct([("word", pa.string()), ("score", pa.float64())]))),
+      ("token_count", pa.int64()),
+      ("char_count", pa.int64()),
+  ])
+
+
+def writeParquet(path: Path, results: List[ClassificationResult]):
+  """Write results to a Parquet file using resultSchema"""
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+
+  columns = {
+      "titles": [r.target.title for r in results],
+      "body_contents": [r.target.body for r in results],
+      "tags": [tagList(r.target.tags) for r in results],
+      "sentiment_score": [r.sentiment_score for r in results],
+      "positive_words": [r.positive_words for r in results],
+      "negative_words": [r.negative_words for r in results],
+      "word_scores": [[{
+          "word": w, "score": s
+      } for w, s in r.word_scores] for r in results],
+      "token_count": [r.token_count for r in results],
+      "char_count": [r.char_count for r in results],
+  }
+  pq.write_table(pa.Table.from_pydict(columns, schema = resultSchema()), path)
+
+
+def targetId(target: ClassificationTarget) -> str:
+  """Stable identifier for a target, derived from its contents"""
+  contents = json.dumps([target.title, target.body, target.tags], default = str)
+  return sha1(contents.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class ResultWriter:
+
+  def __init__(self, filename: str, offset: int = 0, rows: int = 0):
+    """Appends result rows to a CSV file as they are produced
+
+        The file matches the layout written by SentimentClassifier.dumpResults.
+
+        Args:
+            filename: String filename for output csv, excludes file extension
+            offset: Byte offset to resume writing at, anything after it is
+                discarded. Zero starts a new file.
+            rows: Number of rows before offset, used to continue the index"""
+
+    self.path = Path(filename).with_suffix(".csv")
+    self.rows = rows
+
+    if offset and self.path.exists():
+      self.file = open(self.path, "r+", newline = "", encoding = "utf-8")
+      self.file.seek(offset)
+      self.file.truncate()
+      self.writer = csv.writer(self.file)
+    else:
+      self.file = open(self.path, "w", newline = "", encoding = "utf-8")
+      self.writer = csv.writer(self.file)
+      self.writer.writerow([""] + RESULT_COLUMNS)
+
+  def write(self, result: ClassificationResult):
+    self.writer.writerow([self.rows] + [str(v) if isinstance(v, list) else v for v in resultRow(result)])
+    self.rows += 1
+
+  def flush(self) -> int:
+    """Push written rows to disk and return the current byte offset"""
+    self.file.flush()
+    os.fsync(self.file.fileno())
+    return self.file.tell()
+
+  def close(self):
+    self.flush()
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+class Checkpoint:
+
+  def __init__(self, path: Path):
+    """Append-only record of targets whose results are safely on disk
+
+        Each flush appends the newly finished target ids followed by a marker
+        line holding the byte offset and row count of every output file. Ids
+        after the last marker belong to an interrupted flush and are ignored.
+        A target repeated in the input is recorded once per finished copy.
+
+        Args:
+            path: a Pathlib object or str to the checkpoint file"""
+
+    self.path = Path(path)
+    self.done = Counter()
+    self.positions = []
+    self.pending = []
+
+    if not self.path.exists():
+      return
+
+    unconfirmed = []
+    with open(self.path, "r") as stream:
+      for line in stream:
+        line = line.rstrip("\n")
+        if line.startswith("@"):
+          self.done.update(unconfirmed)
+          unconfirmed = []
+          self.positions = json.loads(line[1:])
+        elif line:
+          unconfirmed.append(line)
+
+  def __contains__(self, target_id: str) -> bool:
+    return self.done[target_id] > 0
+
+  def __len__(self) -> int:
+    return sum(self.done.values())
+
+  def unfinished(self, targets: Iterable[ClassificationTarget]) -> Iterator[ClassificationTarget]:
+    """Targets without a recorded result, as of this call
+
+        Each recorded id skips one occurrence of its target, so repeated
+        targets are written once per occurrence, and ids recorded while
+        iterating don't change what is skipped."""
+
+    finished = Counter(self.done)
+
+    def unfinished(target: ClassificationTarget) -> bool:
+      target_id = targetId(target)
+      if finished[target_id] > 0:
+        finished[target_id] -= 1
+        return False
+      return True
+
+    return filter(unfinished, targets)
+
+  def add(self, target_id: str):
+    self.pending.append(target_id)
+
+  def flush(self, positions: List[list]):
+    """Record pending ids as finished, with [offset, rows] for each output file"""
+
+    with open(self.path, "a") as stream:
+      stream.writelines(f"{i}\n" for i in self.pending)
+      stream.write("@" + json.dumps(positions) + "\n")
+      stream.flush()
+      os.fsync(stream.fileno())
+
+    self.done.update(self.pending)
+    self.pending = []
+    self.positions = positions
+
+  def remove(self):
+    """Delete the checkpoint once a run has completed"""
+    self.path.unlink(missing_ok = True)
+
+
+def writeResultFiles(
+    filenames: List[str],
+    targets: Iterable[ClassificationTarget],
+    process: Callable[[Iterable[ClassificationTarget]], Iterator],
+    checkpoint_every: int = 100
+):
+  """Append the results of process(targets) to CSV files as they complete, with checkpoint/resume
+
+    Every checkpoint_every results the files are flushed and the finished
+    target ids are recorded in a checkpoint next to the first file. If a
+    run is interrupted, calling this again with the same filenames skips
+    finished targets and continues the files from the last checkpoint.
+    The checkpoint is removed once every target has been written.
+
+    Args:
+        filenames: One filename per result process yields for a target, a
+            tuple of results goes to the files in order, excluding file extension
+        targets: An iterable of items to classify
+        process: Classifies the unfinished targets, yielding results in their order,
+            e.g. SentimentClassifier.processIter or ClassifierPool.process
+        checkpoint_every: Number of results between checkpoints"""
+
+  checkpoint = Checkpoint(Path(filenames[0]).with_suffix(".checkpoint"))
+  positions = checkpoint.positions or [[0, 0]] * len(filenames)
+  writers = [ResultWriter(f, offset, rows) for f, (offset, rows) in zip(filenames, positions)]
+
+  if len(checkpoint):
+    print(f"Resuming from {checkpoint.path}, skipping {len(checkpoint)} finished targets")
+
+  def flush():
+    checkpoint.flush([[w.flush(), w.rows] for w in writers])
+
+  remaining = checkpoint.unfinished(targets)
+  try:
+    for result in process(remaining):
+      results = result if isinstance(result, tuple) else (result,)
+      for writer, r in zip(writers, results):
+        writer.write(r)
+      checkpoint.add(targetId(results[0].target))
+
+      if len(checkpoint.pending) >= checkpoint_every:
+        flush()
+
+    flush()
+  finally:
+    for writer in writers:
+      writer.close()
+
+  checkpoint.remove()
@@ -1,130 +1,250 @@
-from typing import List
+from typing import Iterator, List
 from pathlib import Path
 from abc import ABC, abstractmethod
 from collections import deque, namedtuple
+from contextlib import asynccontextmanager, nullcontext
 import json
 import re
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from multiprocessing import get_context
+from urllib.parse import urlsplit
 
 # Imports for yaml dumping
 from yaml import add_representer, add_constructor, load, dump, YAMLError
 try:
-    from yaml import CLoader as Loader, CDumper as Dumper
+  from yaml import CLoader as Loader, CDumper as Dumper
 except ImportError:
-    from yaml import Loader, Dumper
+  from yaml import Loader, Dumper
 
+from ai_sentiment.cache import ResponseCache, ResultCache
 from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.extract import extractText
 
-# Imports for reddit scraping
-import praw
-from URS.urs.praw_scrapers.utils.Objectify import Objectify
-# from URS.urs.praw_scrapers.static_scrapers.Comments import SortComments
+# Third party imports for each scraper (praw and URS, pandas, BeautifulSoup and
+# requests, PyPDF2) happen inside the scraper that needs them, so that importing
+# this module for one scraper doesn't pay for all of them
 
-# Imports for website scraper
-import pandas as pd
-from bs4 import BeautifulSoup
-import requests
 
-# Imports for pdf scraper
-from PyPDF2 import PdfReader
+class Scraper(ABC):
 
+  def __init__(self):
+    # Elements waiting to be scraped, each instance has its own
+    self.queue = deque()
 
-class Scraper(ABC):
+  @abstractmethod
+  def scrapeNext(self) -> ClassificationTarget:
+    """Abstract base class that pops from internal queue and creates a classification target"""
+    raise NotImplementedError
+
+  def scrapeAll(self) -> List[ClassificationTarget]:
+    """Scrape all entries in queue and return as list"""
 
-    @abstractmethod
-    def scrapeNext(self) -> ClassificationTarget:
-        """Abstract base class that pops from internal queue and creates a classification target"""
-        raise NotImplementedError
+    return list(self.scrapeIter())
 
-    def scrapeAll(self) -> List[ClassificationTarget]:
-        """Scrape all entries in queue and return as list"""
+  def scrapeIter(self) -> Iterator[ClassificationTarget]:
+    """Scrape entries in queue one at a time, yielding each target as soon as it's ready"""
 
-        r = []
-        while self.queue:
-            r.append(self.scrapeNext())
+    while self.queue:
+      yield self.scrapeNext()
 
-        return r
+  @staticmethod
+  def dumpTargets(output_path: Path, targets: List[ClassificationTarget]):
+    """ Dump list of targets to a path, saves as a yaml.
 
-    @staticmethod
-    def dumpTargets(output_path: Path, targets: List[ClassificationTarget]):
-        """ Dump list of targets to a path, saves as a yaml.
+        Paths ending in .jsonl are written as an ai_sentiment.targets.TargetStore
+        instead, which loads far faster and can be streamed.
 
         Args:
             output_path: a PathLib object or str to the output path, appends extension
             targets: Input list of ClassificationTargets
         """
 
-        # If we're passed a string file path, convert to Pathlib
-        if type(output_path) == str:
-            output_path = Path(output_path)
+    # If we're passed a string file path, convert to Pathlib
+    if type(output_path) == str:
+      output_path = Path(output_path)
 
-        if ".yml" not in output_path.suffixes:
-            output_path = output_path.with_suffix(".yml")
+    if output_path.suffix == ".jsonl":
+      from ai_sentiment.targets import dumpTargets
+      return dumpTargets(output_path, targets)
 
-        # Add representation method for yaml
-        add_representer(ClassificationTarget,
-                        ClassificationTarget.yamlRepresenter)
+    if ".yml" not in output_path.suffixes:
+      output_path = output_path.with_suffix(".yml")
 
-        with open(output_path, "w") as stream:
-            dump(targets, stream, Dumper=Dumper)
+    # Add representation method for yaml
+    add_representer(ClassificationTarget, ClassificationTarget.yamlRepresenter)
 
-    @staticmethod
-    def loadTargets(target_path: Path) -> List[ClassificationTarget]:
-        """ Loads a list of classification targets from a file.
+    with open(output_path, "w") as stream:
+      dump(targets, stream, Dumper = Dumper)
+
+  @staticmethod
+  def loadTargets(target_path: Path) -> List[ClassificationTarget]:
+    """ Loads a list of classification targets from a file.
 
         Args:
             target_path: a Pathlib object or str to input path
         """
 
-        # If we're passed a string file path, convert to Pathlib
-        if type(target_path) == str:
-            target_path = Path(target_path)
+    # If we're passed a string file path, convert to Pathlib
+    if type(target_path) == str:
+      target_path = Path(target_path)
 
-        add_constructor('!ClassificationTarget',
-                        ClassificationTarget.yamlConstructor)
+    if target_path.suffix == ".jsonl":
+      from ai_sentiment.targets import loadTargets
+      return loadTargets(target_path)
 
-        # Load data from target path
-        with open(target_path, 'r') as stream:
-            try:
-                return load(stream, Loader=Loader)
-            except YAMLError as e:
-                print(e)
+    add_constructor('!ClassificationTarget', ClassificationTarget.yamlConstructor)
 
-    queue = deque()
+    # Load data from target path
+    with open(target_path, 'r') as stream:
+      try:
+        return load(stream, Loader = Loader)
+      except YAMLError as e:
+        print(e)
 
 
 RedditQueueElement = namedtuple("RedditQueueElement", ["title", "url", "tags"])
 
 
+def compileKeywords(keywords: List[str]):
+  """Compile keyword patterns into one search function that matches if any keyword does
+
+    Keywords are joined into a single alternation, patterns that can't be
+    combined (e.g. with inline global flags) fall back to separate searches.
+    """
+  try:
+    return re.compile("|".join(f"(?:{kw})" for kw in keywords)).search if keywords else lambda title: None
+  except re.error:
+    patterns = [re.compile(kw) for kw in keywords]
+    return lambda title: any(p.search(title) for p in patterns)
+
+
+def iterUrsPosts(path: Path):
+  """Yield (subreddit, post) for every post in a URS subreddit JSON file
+
+    Uses ijson to stream the data array when it's installed, otherwise the
+    whole file is loaded with json.
+    """
+  try:
+    import ijson
+  except ImportError:
+    with open(path, "r") as read_file:
+      data = json.load(read_file)
+    for post in data["data"]:
+      yield data["scrape_settings"]["subreddit"], post
+    return
+
+  # URS writes scrape_settings ahead of data, so this stops early
+  with open(path, "rb") as read_file:
+    subreddit = next(ijson.items(read_file, "scrape_settings.subreddit"), None)
+
+  with open(path, "rb") as read_file:
+    for post in ijson.items(read_file, "data.item"):
+      yield subreddit, post
+
+
+# Submissions in flight per RedditScraper thread, more are only fetched as results are consumed
+REDDIT_SUBMISSIONS_PER_WORKER = 2
+
+
+class RateLimiter:
+
+  def __init__(self, calls_per_minute: int):
+    """Thread safe limiter that spaces calls evenly to stay within a per-minute budget"""
+    self.interval = 60.0 / calls_per_minute
+    self.next_call = 0.0
+    self.lock = threading.Lock()
+
+  def wait(self):
+    """Block until the caller may make its next call"""
+    with self.lock:
+      now = time.monotonic()
+      delay = self.next_call - now
+      self.next_call = max(now, self.next_call) + self.interval
+
+    if delay > 0:
+      time.sleep(delay)
+
+
+def rateLimitedRequestor(rate_limiter: RateLimiter) -> type:
+  """prawcore Requestor class that waits on rate_limiter before every HTTP request
+
+    praw makes one request per submission fetch and one per "load more
+    comments" expansion, so charging the limiter here covers all of them.
+    """
+  import prawcore
+
+  class RateLimitedRequestor(prawcore.Requestor):
+
+    def request(self, *args, **kwargs):
+      rate_limiter.wait()
+      return super().request(*args, **kwargs)
+
+  return RateLimitedRequestor
+
+
 class RedditScraper(Scraper):
 
-    def __init__(self, keywords: List[str]):
-        """Initialize reddit scraper
+  def __init__(self, keywords: List[str], replace_more_limit: int = 0, requests_per_minute: int = 60):
+    """Initialize reddit scraper
 
         Must match at least one keyword to be added to processing queue
 
         Args:
             keywords: List of regex patterns to match against post titles
+            replace_more_limit: Number of "load more comments" stubs expanded per
+                submission, each costs an API request. 0 drops them, None expands all.
+            requests_per_minute: API budget shared by every scraping thread, each
+                submission fetch and each replace_more expansion counts as a request
         """
-        # List of keywords to be
-        self.keywords = keywords
-
-        # Load local .env file to get praw credientals
-        # Make sure to fill out the env_template file and change its name to .env
-        load_dotenv()
-
-        # Connect to praw API using credientals
-        self.reddit_ = praw.Reddit(
-            client_id=os.getenv("CLIENT_ID"),
-            client_secret=os.getenv("CLIENT_SECRET"),
-            user_agent=os.getenv("USER_AGENT"),
-            username=os.getenv("REDDIT_USERNAME"),
-            password=os.getenv("REDDIT_PASSWORD")
-        )
+    super().__init__()
+
+    # List of keywords to be
+    self.keywords = keywords
+    self.keyword_matcher = compileKeywords(keywords)
+
+    # Ids of posts already queued, so repeated scrape rounds don't queue them twice
+    self.seen_posts = set()
+    self.replace_more_limit = replace_more_limit
+    self.rate_limiter = RateLimiter(requests_per_minute)
+
+    # Clients for scrapeAllThreaded workers, praw instances aren't thread safe
+    self.thread_clients_ = threading.local()
+
+    # Connect to praw API using credientals
+    self.reddit_ = self.redditClient()
+
+  def redditClient(self):
+    """Create a praw client from the credentials in the local .env file
+
+        Every request it makes waits on self.rate_limiter.
+        """
+    import praw
+    from dotenv import load_dotenv
+
+    # Load local .env file to get praw credientals
+    # Make sure to fill out the env_template file and change its name to .env
+    load_dotenv()
 
-    def queuePostsJson(self, path: Path):
-        """Process URS post JSON files and pull comments from posts that meet keywords
+    return praw.Reddit(
+        client_id = os.getenv("CLIENT_ID"),
+        client_secret = os.getenv("CLIENT_SECRET"),
+        user_agent = os.getenv("USER_AGENT"),
+        username = os.getenv("REDDIT_USERNAME"),
+        password = os.getenv("REDDIT_PASSWORD"),
+        requestor_class = rateLimitedRequestor(self.rate_limiter)
+    )
+
+  def queuePostsJson(self, path: Path):
+    """Process URS post JSON files and pull comments from posts that meet keywords
+
+        Posts are parsed one at a time (with ijson, when installed) so large
+        subreddit dumps never sit in memory whole. Posts already queued from
+        another file, by id, are skipped.
 
         Args:
             path: a Pathlib path to the URS json file to be parsed
@@ -132,190 +252,631 @@ class RedditScraper(Scraper):
         Uses URS under the hood on posts that meet keyword filter, due to limitations of that tool this method will not queue
         """
 
-        if not path.exists():
-            raise OSError(f"URS results at {path} not found")
+    if not path.exists():
+      raise OSError(f"URS results at {path} not found")
 
-        # Attempt to load data at path
-        data = None
-        with open(path, "r") as read_file:
-            data = json.loads(read_file.read())
+    # Look through all posts
+    for subreddit, post in iterUrsPosts(path):
 
-        # Look through all posts
-        for post in data["data"]:
+      # If this post has no comments, move on
+      if post["num_comments"] == 0:
+        continue
 
-            # If this post has no comments, move on
-            if post["num_comments"] == 0:
-                continue
+      # Skip posts seen in an earlier scrape round
+      post_id = post.get("id") or post["permalink"]
+      if post_id in self.seen_posts:
+        continue
 
-            # Look through all keywords
-            for kw in self.keywords:
-                # attempt to match
-                match = re.search(kw, post['title'])
+      # If any keyword matches, add to queue
+      if self.keyword_matcher(post["title"]):
+        self.seen_posts.add(post_id)
 
-                # If we have a match, add to queue and go to next post
-                if match:
-                    # Add current post to processing queue, add subreddit and post flair as tag
-                    self.queue.append(RedditQueueElement(post["title"], "https://www.reddit.com" + post["permalink"], [
-                                      "reddit_post", "r/" + data["scrape_settings"]["subreddit"], post["link_flair_text"]]))
-                    break
+        # Add current post to processing queue, add subreddit and post flair as tag
+        self.queue.append(
+            RedditQueueElement(
+                post["title"],
+                "https://www.reddit.com" + post["permalink"],
+                ["reddit_post", "r/" + subreddit, post["link_flair_text"]]
+            )
+        )
 
-    def scrapeNext(self) -> ClassificationTarget:
-        """Create a classification target for the next request in the queue"""
+  def queuePostsDir(self, path: Path):
+    """Process every URS post JSON file under a directory, e.g. scrapes/*/subreddits
 
-        # Get next element in queue
-        cur_element = self.queue.popleft()
+        Files are read in path order, a post that appears in several scrape
+        rounds is only queued once.
 
-        # Create praw submission
-        submission = self.reddit_.submission(url=cur_element.url)
+        Args:
+            path: a Pathlib path to a directory searched recursively for json files
+        """
 
-        # Append all comments in order
-        comments = []
-        for comment in submission.comments.list():
-            # Only extract valid comments
-            if comment is not None and type(comment) == praw.models.reddit.comment.Comment:
-                comments.append(Objectify().make_comment(comment, False))
+    if not path.is_dir():
+      raise OSError(f"URS results directory {path} not found")
 
-        # Staple comment conversation together into a single string
-        body_content = ""
-        for comment_content in comments:
-            body_content += comment_content["author"] + \
-                ": " + comment_content["body"] + ". "
+    for json_path in sorted(path.glob("**/*.json")):
+      self.queuePostsJson(json_path)
 
-        return ClassificationTarget(cur_element.title, body_content, cur_element.tags)
+  def scrapeNext(self) -> ClassificationTarget:
+    """Create a classification target for the next request in the queue"""
+
+    # Get next element in queue
+    cur_element = self.queue.popleft()
+
+    return self.scrapeElement(cur_element, self.reddit_)
+
+  def scrapeAllThreaded(self, workers: int = 4) -> List[ClassificationTarget]:
+    """Scrape all entries in queue with a pool of threads and return them in queue order
+
+        Each thread uses its own praw client, and all of them share
+        self.rate_limiter so the pool stays within the API budget.
+
+        Args:
+            workers: Number of submissions fetched concurrently
+        """
+    return list(self.scrapeIterThreaded(workers))
+
+  def scrapeIterThreaded(self, workers: int = 4) -> Iterator[ClassificationTarget]:
+    """Like scrapeAllThreaded, but yields targets in queue order as they complete
+
+        Elements are only taken off the queue as they are submitted, with at
+        most workers * REDDIT_SUBMISSIONS_PER_WORKER in flight, so a consumer
+        that falls behind holds back scraping instead of buffering results.
+        scrapeIter, used by scrapeAll and ai_sentiment.pipeline, stays serial.
+        """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def scrape(element):
+      if not hasattr(self.thread_clients_, "reddit"):
+        self.thread_clients_.reddit = self.redditClient()
+      return self.scrapeElement(element, self.thread_clients_.reddit)
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+      try:
+        while self.queue or pending:
+          while self.queue and len(pending) < workers * REDDIT_SUBMISSIONS_PER_WORKER:
+            pending.append(executor.submit(scrape, self.queue.popleft()))
+          yield pending.popleft().result()
+      finally:
+        # A consumer that stops early doesn't wait for submissions it won't read
+        for future in pending:
+          future.cancel()
+
+  def scrapeElement(self, element: RedditQueueElement, reddit) -> ClassificationTarget:
+    """Fetch a submission's comments with the given praw client and staple them into a target"""
+    import praw
+    from URS.urs.praw_scrapers.utils.Objectify import Objectify
+    # from URS.urs.praw_scrapers.static_scrapers.Comments import SortComments
+
+    # Create praw submission, its comments are fetched on first access
+    submission = reddit.submission(url = element.url)
+
+    # Expand at most replace_more_limit "load more" stubs and drop the rest,
+    # the client's requestor charges the rate limiter for each expansion
+    submission.comments.replace_more(limit = self.replace_more_limit)
+
+    # Append all comments in order
+    objectify = Objectify()
+    comments = []
+    for comment in submission.comments.list():
+      # Only extract valid comments
+      if comment is not None and type(comment) == praw.models.reddit.comment.Comment:
+        comments.append(objectify.make_comment(comment, False))
+
+    # Staple comment conversation together into a single string, in linear time
+    body_content = "".join([
+        comment_content["author"] + ": " + comment_content["body"] + ". " for comment_content in comments
+    ])
+
+    return ClassificationTarget(element.title, body_content, element.tags)
 
 
 WebQueueElement = namedtuple("WebQueueElement", ["title", "url", "tags"])
 
+# Rows read per chunk by iterCsvRows
+CSV_CHUNK_ROWS = 10_000
+
+
+def iterCsvRows(path: Path, columns: List[str], chunk_rows: int = CSV_CHUNK_ROWS, engine: str = "pandas"):
+  """Yield tuples of the given columns from a CSV, reading it in chunks
+
+    Only one chunk is held in memory at a time, so arbitrarily large exports
+    can be streamed. Every value is read as a string, missing values are
+    returned as "" rather than NaN.
+
+    Args:
+        path: A PathLib path to a csv file
+        columns: Names of the columns to read, in the order they are yielded
+        chunk_rows: Rows per chunk, pyarrow reads blocks of roughly chunk_rows KiB instead
+        engine: "pandas", or "pyarrow" to use pyarrow's streaming CSV reader
+    """
+  if engine == "pyarrow":
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    reader = pa_csv.open_csv(
+        path,
+        read_options = pa_csv.ReadOptions(block_size = chunk_rows * 1024),
+        # Article bodies contain quoted newlines
+        parse_options = pa_csv.ParseOptions(newlines_in_values = True),
+        convert_options = pa_csv.ConvertOptions(
+            include_columns = columns,
+            column_types = { c: pa.string()
+                             for c in columns },
+            strings_can_be_null = False,
+            quoted_strings_can_be_null = False
+        )
+    )
+    for batch in reader:
+      yield from zip(*(batch.column(c).to_pylist() for c in columns))
+    return
+
+  import pandas as pd
+
+  with pd.read_csv(path, usecols = columns, dtype = str, keep_default_na = False,
+                   chunksize = chunk_rows) as chunks:
+    for chunk in chunks:
+      yield from zip(*(chunk[c].to_numpy() for c in columns))
+
+
+def isEmptyBody(body) -> bool:
+  """True for missing bodies, including the "nan" strings older exports wrote for them"""
+  if body is None or body != body:
+    return True
+  body = str(body).strip()
+  return not body or body.lower() == "nan"
+
+
+# Taken from https://importsem.com/evaluate-sentiment-analysis-in-bulk-with-spacy-and-python/
+WEB_HEADERS = {
+    'user-agent':
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_0) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/78.0.3904.108 Safari/537.36'
+}
+
+# Responses worth retrying, anything else is returned or raised straight away
+RETRY_STATUSES = { 429, 500, 502, 503, 504 }
+
+
+class RequestSlots:
+
+  def __init__(self, concurrency: int, per_host: int):
+    """Bounds on requests in flight, overall and to each host
+
+        Requests wait for a slot before they are sent, so their timeout only
+        covers the request itself rather than time spent queued behind others.
+        Must be created inside the event loop that uses it.
+
+        Args:
+            concurrency: Maximum number of requests in flight
+            per_host: Maximum number of requests in flight to any one host
+        """
+    import asyncio
+
+    self.total = asyncio.Semaphore(concurrency)
+    self.per_host = per_host
+    self.hosts = {}
+
+  @asynccontextmanager
+  async def slot(self, url: str):
+    """Hold a slot for one request to url"""
+    import asyncio
+
+    host = urlsplit(url).netloc
+    if host not in self.hosts:
+      self.hosts[host] = asyncio.Semaphore(self.per_host)
+
+    # Host first, so requests queued for a busy host don't hold overall slots
+    async with self.hosts[host], self.total:
+      yield
+
+
 class WebScraper(Scraper):
 
-    def __init__(self):
-        """Init for web scraper"""
+  def __init__(
+      self,
+      timeout: float = 30,
+      retries: int = 3,
+      backoff: float = 1.0,
+      cache: ResponseCache = None,
+      offline: bool = False,
+      extractor: str = "bs4"
+  ):
+    """Init for web scraper
+
+        Args:
+            timeout: Seconds allowed for each request
+            retries: Number of times a failed request is retried
+            backoff: Seconds before the first retry, doubled for each further retry
+            cache: Optional ResponseCache, cached pages are revalidated with
+                conditional requests instead of downloaded again
+            offline: Only serve pages from cache, never touch the network
+            extractor: HTML-to-text backend, one of ai_sentiment.extract.EXTRACTORS
+        """
+    if offline and cache is None:
+      raise ValueError("offline mode needs a response cache")
+
+    super().__init__()
+    self.timeout = timeout
+    self.retries = retries
+    self.backoff = backoff
+    self.cache = cache
+    self.offline = offline
+    self.extractor = extractor
+
+    # Pooled connections for scrapeNext, created on first use
+    self.session = None
+
+    # (queue element, exception) for every page scrapeAllAsync gave up on
+    self.failed = []
+
+  def queueWebsiteCSV(self, path: Path, chunk_rows: int = CSV_CHUNK_ROWS, engine: str = "pandas"):
+    """Process a CSV of website URLs and add them to the queue
 
-    def queueWebsiteCSV(self, path: Path):
-        """Process a CSV of website URLs and add them to the queue
+        Rows without an address are skipped.
 
         Args:
-            path: A PathLib path to a csv file with three columns \"Title\", \"Addresses\", and \"Tags\" """
+            path: A PathLib path to a csv file with three columns \"Title\", \"Addresses\", and \"Tags\"
+            chunk_rows: Rows read at a time, see iterCsvRows
+            engine: CSV reader, "pandas" or "pyarrow" """
+
+    # Append entries to queue
+    for title, url, tag in iterCsvRows(path, ["Titles", "Addresses", "Tags"], chunk_rows, engine):
+      if url:
+        self.queue.append(WebQueueElement(title, url, tag or None))
+
+  def cachedResponse(self, url: str):
+    """Cached response for url if there is a cache, raises in offline mode when it is missing"""
+
+    cached = self.cache.get(url) if self.cache is not None else None
+    if self.offline and cached is None:
+      raise LookupError(f"{url} is not in the response cache")
+    return cached
+
+  def cacheResponse(self, url: str, status: int, body: str, headers) -> str:
+    """Store a fresh 200 response in the cache, returns body"""
+
+    if self.cache is not None and status == 200:
+      self.cache.put(url, body, headers.get("ETag"), headers.get("Last-Modified"))
+    return body
+
+  def fetch(self, url: str) -> str:
+    """GET url through the response cache, returns the page text"""
+    import requests
+
+    cached = self.cachedResponse(url)
+    if self.offline:
+      return cached.body
+
+    if self.session is None:
+      self.session = requests.Session()
+      self.session.headers.update(WEB_HEADERS)
 
-        # Read columns
-        df = pd.read_csv(path)
-        titles = df["Titles"].tolist()
-        urls = df["Addresses"].tolist()
-        tags = df["Tags"].tolist()
+    res = self.session.get(url, headers = ResponseCache.conditionalHeaders(cached), timeout = self.timeout)
+    if res.status_code == 304 and cached is not None:
+      self.cache.touch(url)
+      return cached.body
 
-        # Append entries to queue
-        for title, url, tag in zip(titles, urls, tags):
-            self.queue.append(WebQueueElement(title, url, tag))
+    return self.cacheResponse(url, res.status_code, res.text, res.headers)
 
-    def scrapeNext(self) -> ClassificationTarget:
-        """Create a classification target for the next request in the queue"""
+  def scrapeNext(self) -> ClassificationTarget:
+    """Create a classification target for the next request in the queue"""
 
-        # Get next element in queue
-        cur_element = self.queue.popleft()
+    # Get next element in queue
+    cur_element = self.queue.popleft()
 
-        # Taken from https://importsem.com/evaluate-sentiment-analysis-in-bulk-with-spacy-and-python/
-        headers = {
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/78.0.3904.108 Safari/537.36'}
-        res = requests.get(cur_element.url, headers=headers)
-        html_page = res.text
+    html_page = self.fetch(cur_element.url)
 
-        soup = BeautifulSoup(html_page, 'html.parser')
-        for script in soup(["script", "style", "meta", "label", "header", "footer"]):
-            script.decompose()
-        page_text = (soup.get_text()).lower()
-        page_text = page_text.strip().replace("  ", "")
-        page_text = "".join(
-            [s for s in page_text.splitlines(True) if s.strip("\r\n")])
+    body = extractText(html_page, self.extractor)
+    return ClassificationTarget(cur_element.title, body, cur_element.tags)
 
+  def scrapeAllAsync(self, concurrency: int = 32, per_host: int = 4) -> List[ClassificationTarget]:
+    """Scrape all entries in queue concurrently and return them in queue order
+
+        Pages that still fail after all retries are left out of the result
+        and recorded in self.failed.
+
+        Args:
+            concurrency: Maximum number of requests in flight
+            per_host: Maximum number of requests in flight to any one host
+        """
+    import asyncio
+
+    return asyncio.run(self.scrapeAllConcurrent(concurrency, per_host))
+
+  async def scrapeAllConcurrent(self, concurrency: int = 32, per_host: int = 4) -> List[ClassificationTarget]:
+    """Coroutine behind scrapeAllAsync, for callers that already run an event loop"""
+    import asyncio
+    import aiohttp
+
+    elements = list(self.queue)
+    self.queue.clear()
+
+    # Requests wait for a slot before they start, so the connector never has to queue them
+    # and the session timeout only counts time after a request is sent
+    slots = RequestSlots(concurrency, per_host)
+    connector = aiohttp.TCPConnector(limit = concurrency, limit_per_host = per_host)
+    timeout = aiohttp.ClientTimeout(total = self.timeout)
+    session = aiohttp.ClientSession(connector = connector, timeout = timeout, headers = WEB_HEADERS)
+    async with session:
+      pages = await asyncio.gather(
+          *(self.fetchAsync(session, e.url, slots) for e in elements), return_exceptions = True
+      )
+
+    targets = []
+    for element, page in zip(elements, pages):
+      if isinstance(page, Exception):
+        print(f"Failed to scrape {element.url}: {type(page).__name__} {page}")
+        self.failed.append((element, page))
+      else:
+        body = extractText(page, self.extractor)
+        targets.append(ClassificationTarget(element.title, body, element.tags))
+
+    return targets
+
+  async def fetchAsync(self, session, url: str, slots: RequestSlots = None) -> str:
+    """GET url through the response cache with retries and exponential backoff, returns the page text
+
+        With slots, each attempt waits for a free slot and releases it while backing off.
+        """
+    import asyncio
+    import aiohttp
+
+    cached = self.cachedResponse(url)
+    if self.offline:
+      return cached.body
+
+    for attempt in range(self.retries + 1):
+      delay = self.backoff * 2**attempt
+      slot = slots.slot(url) if slots is not None else nullcontext()
+      try:
+        async with slot, session.get(url, headers = ResponseCache.conditionalHeaders(cached)) as res:
+          if res.status == 304 and cached is not None:
+            self.cache.touch(url)
+            return cached.body
+
+          if res.status not in RETRY_STATUSES:
+            res.raise_for_status()
+            body = await res.text(errors = "replace")
+            return self.cacheResponse(url, res.status, body, res.headers)
+
+          # Honour the server's requested delay when it gives one in seconds
+          retry_after = res.headers.get("Retry-After", "")
+          if retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+          error = aiohttp.ClientResponseError(res.request_info, res.history, status = res.status)
+      except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+        error = e
+
+      if attempt < self.retries:
+        await asyncio.sleep(delay)
+
+    raise error
 
 
-        return ClassificationTarget(cur_element.title, page_text, cur_element.tags)
-    
 CSVQueueElement = namedtuple("CSVQueueElement", ["title", "url", "body", "tags"])
 
+
 class CSVScraper(Scraper):
 
-    def __init__(self):
-        """Init for web scraper"""
+  def __init__(self, drop_empty: bool = True):
+    """Init for csv scraper
 
-    def queueCSV(self, path: Path):
-        """Process a CSV of article data and add them to the queue.
+        Args:
+            drop_empty: Leave rows with an empty or "nan" body out of the queue,
+                otherwise they are queued with an empty body. Either way their
+                titles are recorded in self.empty_bodies.
+        """
+    super().__init__()
+    self.drop_empty = drop_empty
+    self.empty_bodies = []
+
+  def iterCSV(self,
+              path: Path,
+              chunk_rows: int = CSV_CHUNK_ROWS,
+              engine: str = "pandas") -> Iterator[ClassificationTarget]:
+    """Yield a classification target per row of an article CSV without queueing them
+
+        Reads the file in chunks, so memory use doesn't grow with its size.
+        Accepts the same files and arguments as queueCSV.
+        """
+    for title, url, body in self.iterRows(path, chunk_rows, engine):
+      yield ClassificationTarget(title, body, [])
+
+  def iterRows(self, path: Path, chunk_rows: int, engine: str):
+    """(title, url, body) for every row to be classified, applying drop_empty"""
+    for title, url, body in iterCsvRows(path, ["Title", "Link", "Body"], chunk_rows, engine):
+      if isEmptyBody(body):
+        self.empty_bodies.append(title)
+        if self.drop_empty:
+          continue
+        body = ""
+      yield title, url, body
+
+  def queueCSV(self, path: Path, chunk_rows: int = CSV_CHUNK_ROWS, engine: str = "pandas"):
+    """Process a CSV of article data and add them to the queue.
 
         Unlike the WebScraper, this scraper will not attempt to scrape the body of the article, but will instead use the body.
 
         Args:
-            path: A PathLib path to a csv file with four columns \"Title\", \"Addresses\", \"Body\", and \"Tags\" """
+            path: A PathLib path to a csv file with four columns \"Title\", \"Addresses\", \"Body\",
+                and \"Tags\"
+            chunk_rows: Rows read at a time, see iterCsvRows
+            engine: CSV reader, "pandas" or "pyarrow" """
 
-        # Read columns
-        df = pd.read_csv(path)
-        titles = df["Title"].tolist()
-        urls = df["Link"].tolist()
-        bodies = df["Body"].tolist()
+    # Append entries to queue
+    for title, url, body in self.iterRows(path, chunk_rows, engine):
+      self.queue.append(CSVQueueElement(title, url, body, []))
 
-        # Append entries to queue
-        for title, url, body in zip(titles, urls, bodies):
-            self.queue.append(CSVQueueElement(title, url, body, []))
-    
-    def scrapeNext(self) -> ClassificationTarget:
-        """Create a classification target for the next request in the queue"""
+  def scrapeNext(self) -> ClassificationTarget:
+    """Create a classification target for the next request in the queue"""
 
-        # Get next element in queue
-        cur_element = self.queue.popleft()
+    # Get next element in queue
+    cur_element = self.queue.popleft()
+
+    return ClassificationTarget(cur_element.title, cur_element.body, cur_element.tags)
 
-        return ClassificationTarget(cur_element.title, str(cur_element.body), cur_element.tags)
-    
 
 PDFQueueElement = namedtuple("PDFQueueElement", ["title", "path", "tags"])
 
+# PDFs larger than this are extracted in page ranges spread across workers
+LARGE_PDF_BYTES = 8 * 2**20
+PDF_PAGES_PER_TASK = 25
+
+
+def pdfText(path: Path, start: int = 0, stop: int = None) -> str:
+  """Extract the body text of pages [start, stop) of a PDF, skipping headers and footers"""
+  from PyPDF2 import PdfReader
+
+  parts = []
+
+  def visitor_body(text, cm, tm, fontDict, fontSize):
+    # Checks that text isn't in header or footer
+    y = tm[5]
+    if y > 50 and y < 720:
+      parts.append(text)
+
+  pdf = PdfReader(path)
+  for p in pdf.pages[start:stop]:
+    p.extract_text(visitor_text = visitor_body)
+
+  return "".join(parts)
+
+
+def _pdfTask(task) -> str:
+  """Process pool entry point, task is a (path, start, stop) tuple"""
+  return pdfText(*task)
+
+
+def fileDigest(path: Path) -> str:
+  """sha256 of a file's contents, read in chunks"""
+  digest = sha256()
+  with open(path, "rb") as stream:
+    for chunk in iter(lambda: stream.read(2**20), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
 class PDFScraper(Scraper):
 
-    def __init__(self):
-        """Init for pdf scraper"""
+  def __init__(self, cache: ResultCache = None, quiet: bool = True):
+    """Init for pdf scraper
+
+        Args:
+            cache: Optional ResultCache for extracted text, keyed by file
+                hash so renamed or re-queued files are never extracted twice
+            quiet: Don't print the extracted text parts, pass False to print them for debugging
+        """
+    super().__init__()
+    self.cache = cache
+    self.quiet = quiet
 
-    # TODO Add better tags
-    def queuePDF(self, path: Path):
-        """Process a PDF file and add it to the queue
+  # TODO Add better tags
+  def queuePDF(self, path: Path):
+    """Process a PDF file and add it to the queue
 
         Args:
             path: A PathLib path to a pdf file """
 
-        # Append entries to queue
-        self.queue.append(PDFQueueElement(path.name, path, ["pdf"]))
-        
-    def queueDir(self, path: Path):
-        """Process a directory of PDF files and add them to the queue
+    # Append entries to queue
+    self.queue.append(PDFQueueElement(path.name, path, ["pdf"]))
+
+  def queueDir(self, path: Path):
+    """Process a directory of PDF files and add them to the queue
         
         Args:
             path: A PathLib path to a directory of pdf files """
-            
-        # Find all PDFs in directory
-        for file in path.glob("*.pdf"):
-            self.queue.append(PDFQueueElement(file.name, file, ["pdf"]))
 
-            
-    def scrapeNext(self) -> ClassificationTarget:
-        
-        # Get next element in queue
-        cur_element = self.queue.popleft()
+    # Find all PDFs in directory
+    for file in path.glob("*.pdf"):
+      self.queue.append(PDFQueueElement(file.name, file, ["pdf"]))
 
-        # Create visitor function
-        parts = []
+  @staticmethod
+  def cacheKey(digest: str) -> str:
+    """Cache key for the text of the file with this digest, changes with PyPDF2's version"""
+    try:
+      extractor = version("PyPDF2")
+    except PackageNotFoundError:
+      extractor = None
+    return ResultCache.key(f"pdf-text:{extractor}", digest)
 
-        def visitor_body(text, cm, tm, fontDict, fontSize):
-            # Checks that text isn't in header or footer
-            y = tm[5]
-            if y > 50 and y < 720:
-                parts.append(text)
-        
-        # Extract text from PDF
-        pdf = PdfReader(cur_element.path)
-        
-        for p in pdf.pages:
-            p.extract_text(visitor_text=visitor_body)
-        
-        print(f"parts {parts}")
-        
-        # Join all pages together
-        text = "".join(parts)
-        
-        return ClassificationTarget(cur_element.title, text, cur_element.tags)
+  def cachedText(self, key: str) -> str:
+    return self.cache.get(key) if self.cache is not None else None
+
+  def cacheText(self, key: str, text: str):
+    if self.cache is not None:
+      self.cache.put(key, text)
+
+  def scrapeNext(self) -> ClassificationTarget:
+    # Get next element in queue
+    cur_element = self.queue.popleft()
+
+    key = self.cacheKey(fileDigest(cur_element.path)) if self.cache is not None else None
+    text = self.cachedText(key)
+    if text is None:
+      text = pdfText(cur_element.path)
+      self.cacheText(key, text)
+
+    if not self.quiet:
+      print(f"parts {text}")
+
+    return ClassificationTarget(cur_element.title, text, cur_element.tags)
+
+  def scrapeAllParallel(self,
+                        workers: int = None,
+                        pages_per_task: int = PDF_PAGES_PER_TASK) -> List[ClassificationTarget]:
+    """Extract every queued PDF across a pool of worker processes
+
+        Small PDFs are one task each, PDFs over LARGE_PDF_BYTES are split into
+        page ranges so a single big document doesn't leave the other workers
+        idle. Cached files are never sent to the pool.
+
+        Args:
+            workers: Number of worker processes, defaults to the number of CPUs
+            pages_per_task: Pages per task when splitting a large PDF
+
+        Return:
+            Targets in queue order
+        """
+    from PyPDF2 import PdfReader
+
+    elements = list(self.queue)
+    self.queue.clear()
+
+    texts = [None] * len(elements)
+    keys = [None] * len(elements)
+    tasks = []
+    owners = []
+
+    for i, element in enumerate(elements):
+      if self.cache is not None:
+        keys[i] = self.cacheKey(fileDigest(element.path))
+        texts[i] = self.cachedText(keys[i])
+        if texts[i] is not None:
+          continue
+
+      if os.path.getsize(element.path) > LARGE_PDF_BYTES:
+        pages = len(PdfReader(element.path).pages)
+        for start in range(0, pages, pages_per_task):
+          tasks.append((element.path, start, start + pages_per_task))
+          owners.append(i)
+      else:
+        tasks.append((element.path, 0, None))
+        owners.append(i)
+
+    if tasks:
+      parts = [[] for _ in elements]
+      # Spawn for the same reason as ai_sentiment.parallel, callers may have torch loaded
+      with ProcessPoolExecutor(max_workers = workers, mp_context = get_context("spawn")) as executor:
+        for owner, text in zip(owners, executor.map(_pdfTask, tasks)):
+          parts[owner].append(text)
+
+      for i in set(owners):
+        texts[i] = "".join(parts[i])
+        self.cacheText(keys[i], texts[i])
+
+    if not self.quiet:
+      for text in texts:
+        print(f"parts {text}")
+
+    return [ClassificationTarget(e.title, text, e.tags) for e, text in zip(elements, texts)]
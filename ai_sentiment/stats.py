@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ai_sentiment.results import COUNT_COLUMNS, wordCount
+
+# Score quantiles reported by corpusStats
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def corpusStats(corpus: pd.DataFrame, by: Sequence[str] = ("alignment",)) -> pd.DataFrame:
+  """Article, token and character totals and sentiment score quantiles per group
+
+    Works from the token_count and char_count result columns, so the
+    corpus doesn't need body_contents.
+
+    Args:
+        corpus: Results frame from loadCorpus with sentiment_score,
+            token_count and char_count columns
+        by: Columns to group by, e.g. ("source",) or ("alignment",)
+
+    Return:
+        Frame indexed by the by columns, with articles, tokens, chars,
+        mean_score and one score_q<percent> column per QUANTILES entry"""
+
+  grouped = corpus.groupby(list(by), observed = True)
+  stats = grouped.agg(
+      articles = ("sentiment_score", "size"),
+      tokens = ("token_count", "sum"),
+      chars = ("char_count", "sum"),
+      mean_score = ("sentiment_score", "mean"),
+  )
+  quantiles = grouped["sentiment_score"].quantile(list(QUANTILES)).unstack()
+  quantiles.columns = [f"score_q{round(q * 100)}" for q in quantiles.columns]
+  return stats.join(quantiles)
+
+
+def bodyCounts(bodies: Iterable) -> Dict[str, np.ndarray]:
+  """token_count and char_count of each body, missing bodies count as empty"""
+  bodies = ["" if b is None or b != b else str(b) for b in bodies]
+  return {
+      "token_count": np.fromiter(map(wordCount, bodies), dtype = np.int64, count = len(bodies)),
+      "char_count": np.fromiter(map(len, bodies), dtype = np.int64, count = len(bodies)),
+  }
+
+
+def backfillCounts(paths: Iterable) -> List[str]:
+  """Add token_count and char_count to result CSVs written before those columns existed
+
+    A one-off migration, see scripts/backfill_counts.py. loadResults only
+    counts missing columns in memory when they're asked for, and leaves
+    them out otherwise.
+    Each file's bodies are counted once and the counts are written back
+    into it, files that already have the columns aren't read past their
+    header.
+
+    Return:
+        Paths of the files that were updated"""
+
+  updated = []
+  for path in map(str, paths):
+    if Path(path).suffix != ".csv":
+      continue
+    if set(COUNT_COLUMNS) <= set(pd.read_csv(path, nrows = 0).columns):
+      continue
+
+    # Cells are kept as text so that the rest of the file is written back unchanged
+    df = pd.read_csv(path, index_col = 0, dtype = str, keep_default_na = False)
+    for column, counts in bodyCounts(df["body_contents"]).items():
+      df[column] = counts
+    df.to_csv(path)
+    updated.append(path)
+
+  return updated
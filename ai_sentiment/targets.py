@@ -0,0 +1,163 @@
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from ai_sentiment.data import ClassificationTarget
+
+
+def encodeTarget(target: ClassificationTarget) -> bytes:
+  """One JSON line for a target"""
+  record = { "title": target.title, "body": target.body, "tags": target.tags}
+  return json.dumps(record, ensure_ascii = False, default = str).encode("utf-8", "surrogatepass") + b"\n"
+
+
+def decodeTarget(line: bytes) -> ClassificationTarget:
+  return ClassificationTarget(**json.loads(line.decode("utf-8", "surrogatepass")))
+
+
+class TargetStore:
+
+  def __init__(self, path: Path):
+    """Append-only JSONL file of classification targets with a byte offset index
+
+        Targets are stored one JSON object per line in path. The sidecar
+        path + ".idx" holds the starting offset of every line as packed
+        uint64s, so store[i] seeks straight to a target. If lines were
+        appended by something else, the index is extended by scanning only
+        the part of the file it doesn't cover.
+
+        Args:
+            path: a Pathlib object or str to the .jsonl file, created if missing"""
+
+    self.path = Path(path)
+    self.index_path = self.path.with_name(self.path.name + ".idx")
+    self.path.parent.mkdir(parents = True, exist_ok = True)
+
+    self.file = open(self.path, "a+b")
+    self.offsets = array("Q")
+    self.index_path.touch()
+    with open(self.index_path, "rb") as stream:
+      data = stream.read()
+      # A torn write can leave a partial offset at the end
+      self.offsets.frombytes(data[:len(data) - len(data) % self.offsets.itemsize])
+
+    self.refreshIndex()
+
+  def refreshIndex(self):
+    """Index any lines past the last indexed one and drop a partially written last line"""
+
+    size = os.path.getsize(self.path)
+    indexed = len(self.offsets)
+    while self.offsets and self.offsets[-1] >= size:
+      self.offsets.pop()
+
+    # The last indexed line is re-read to find where unindexed lines start
+    start = self.offsets.pop() if self.offsets else 0
+    self.file.seek(start)
+    end = start
+    for line in self.file:
+      if not line.endswith(b"\n"):
+        break
+      self.offsets.append(end)
+      end += len(line)
+
+    # Left behind by an interrupted append, the next one would run into it
+    if end < size:
+      self.file.truncate(end)
+
+    if len(self.offsets) != indexed or os.path.getsize(self.index_path) != self.offsets.itemsize * indexed:
+      self.writeIndex()
+
+  def writeIndex(self):
+    with open(self.index_path, "wb") as stream:
+      self.offsets.tofile(stream)
+
+  def append(self, target: ClassificationTarget):
+    self.extend([target])
+
+  def extend(self, targets: Iterable[ClassificationTarget]):
+    """Append targets and index them"""
+
+    self.file.seek(0, os.SEEK_END)
+    offset = self.file.tell()
+    new_offsets = array("Q")
+    for target in targets:
+      line = encodeTarget(target)
+      self.file.write(line)
+      new_offsets.append(offset)
+      offset += len(line)
+    self.file.flush()
+
+    self.offsets.extend(new_offsets)
+    with open(self.index_path, "ab") as stream:
+      new_offsets.tofile(stream)
+
+  def __len__(self) -> int:
+    return len(self.offsets)
+
+  def __getitem__(self, i: int) -> ClassificationTarget:
+    """Read the i-th target without touching the rest of the file"""
+    self.file.seek(self.offsets[i])
+    return decodeTarget(self.file.readline())
+
+  def __iter__(self) -> Iterator[ClassificationTarget]:
+    """Stream targets in order, only one line is held in memory at a time"""
+    with open(self.path, "rb") as stream:
+      for line in stream:
+        if line.endswith(b"\n"):
+          yield decodeTarget(line)
+
+  def close(self):
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def dumpTargets(path: Path, targets: Iterable[ClassificationTarget]):
+  """Write targets to a new store at path, replacing any existing one"""
+  path = Path(path)
+  path.unlink(missing_ok = True)
+  path.with_name(path.name + ".idx").unlink(missing_ok = True)
+  with TargetStore(path) as store:
+    store.extend(targets)
+
+
+def teeTargets(path: Path, targets: Iterable[ClassificationTarget]) -> Iterator[ClassificationTarget]:
+  """Like dumpTargets, but yield each target as it's written so the store can be filled while
+    targets are consumed downstream, one at a time"""
+  path = Path(path)
+  path.unlink(missing_ok = True)
+  path.with_name(path.name + ".idx").unlink(missing_ok = True)
+  with TargetStore(path) as store:
+    for target in targets:
+      store.append(target)
+      yield target
+
+
+def loadTargets(path: Path) -> List[ClassificationTarget]:
+  """Read every target in a store into a list"""
+  with TargetStore(path) as store:
+    return list(store)
+
+
+def convertYamlTargets(yaml_path: Path, store_path: Path = None) -> Path:
+  """Convert a targets file written by Scraper.dumpTargets to a TargetStore
+
+    Args:
+        yaml_path: a Pathlib object or str to the .yml file
+        store_path: Output .jsonl path, defaults to yaml_path with its suffix replaced
+
+    Return:
+        Path to the store"""
+  from ai_sentiment.scraper import Scraper
+
+  yaml_path = Path(yaml_path)
+  store_path = Path(store_path) if store_path else yaml_path.with_suffix(".jsonl")
+  dumpTargets(store_path, Scraper.loadTargets(yaml_path) or [])
+  return store_path
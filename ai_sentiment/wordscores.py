@@ -0,0 +1,77 @@
+from itertools import chain
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def wordScorePairs(cell) -> List[Tuple[str, float]]:
+  """(word, score) pairs of a word_scores cell, from CSV tuples or Parquet {"word", "score"} structs"""
+  return [(p["word"], p["score"]) if isinstance(p, dict) else tuple(p) for p in cell]
+
+
+def explodeWordScores(corpus: pd.DataFrame, by: Sequence[str] = ("source", "alignment")) -> pd.DataFrame:
+  """One row per scored word occurrence, with the given columns of the result it came from
+
+    Accepts word_scores cells as (word, score) pairs from CSV files,
+    {"word", "score"} structs from Parquet files, or a mix of both."""
+
+  cells = corpus["word_scores"]
+  lengths = np.fromiter(map(len, cells), dtype = np.intp, count = len(cells))
+  pairs = wordScorePairs(chain.from_iterable(cells))
+
+  words, scores = zip(*pairs) if pairs else ((), ())
+
+  # Taking rows by position keeps categorical columns as codes
+  frame = corpus[list(by)].iloc[np.repeat(np.arange(len(corpus)), lengths)].reset_index(drop = True)
+  frame["word"] = np.asarray(words, dtype = object)
+  frame["score"] = np.asarray(scores, dtype = np.float64)
+  return frame
+
+
+def wordScoreStats(
+    corpus: pd.DataFrame,
+    by: Sequence[str] = ("source", "alignment"),
+    lowercase: bool = True
+) -> pd.DataFrame:
+  """Count, mean and variance of each word's score within each group
+
+    Groups are formed by factorising the word and group columns into
+    integer codes, then reduced with np.bincount, so the cost is a few
+    passes over the occurrences regardless of how many groups there are.
+
+    Args:
+        corpus: Results frame with a word_scores column, e.g. from loadCorpus
+        by: Columns to group by as well as the word
+        lowercase: Fold words to lowercase before grouping
+
+    Return:
+        Frame with the by columns, word, count, mean and var (sample
+        variance, NaN for words seen once), one row per group and word"""
+
+  by = list(by)
+  occurrences = explodeWordScores(corpus, by)
+  words = occurrences["word"].str.lower() if lowercase else occurrences["word"]
+
+  # Combine the codes of every key column into one integer per occurrence, then number the distinct ones
+  codes = [pd.factorize(occurrences[c], use_na_sentinel = False)[0] for c in by] + [pd.factorize(words)[0]]
+  combined = np.ravel_multi_index(codes, [int(c.max()) + 1 if len(c) else 1 for c in codes])
+  group, uniques = pd.factorize(combined)
+  groups = len(uniques)
+
+  scores = occurrences["score"].to_numpy()
+  count = np.bincount(group, minlength = groups)
+  mean = np.bincount(group, weights = scores, minlength = groups) / np.maximum(count, 1)
+  squares = np.bincount(group, weights = (scores - mean[group])**2, minlength = groups)
+  with np.errstate(invalid = "ignore", divide = "ignore"):
+    var = np.where(count > 1, squares / (count - 1), np.nan)
+
+  # Groups are numbered in order of first appearance, their first occurrences carry the labels
+  representative = np.unique(group, return_index = True)[1]
+
+  stats = occurrences.iloc[representative][by].reset_index(drop = True)
+  stats["word"] = words.iloc[representative].to_numpy()
+  stats["count"] = count
+  stats["mean"] = mean
+  stats["var"] = var
+  return stats
@@ -1,36 +1,150 @@
+from argparse import ArgumentParser
+from collections import Counter
+from contextlib import nullcontext
 from pathlib import Path
-from sys import argv
+from typing import Iterable, Optional
 
-from ai_sentiment.nlp import AsentSentimentClassifier, SentimentClassifier
+from ai_sentiment.cache import ResultCache
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.docstore import DocStore
+from ai_sentiment.filters import TargetFilter, writeSkipReport
+from ai_sentiment.frequencies import FrequencyIndex
+from ai_sentiment.nlp import DualSentimentClassifier
+from ai_sentiment.parallel import ClassifierPool, WorkerInitError
 from ai_sentiment.scraper import CSVScraper
+from ai_sentiment.targets import teeTargets
 
-for data_path in argv[1:]:
-  try:
-    # Path to scrapes to look at
-    csv_path = Path(data_path)
-
-    # Project root dir
-    project_dir = Path(__file__).parents[1]
-
-    print(f"Loading data from {project_dir / csv_path}")
-    csv_scraper = CSVScraper()
-    csv_scraper.queueCSV(project_dir / csv_path)
-
-    # Extract text articles
-    targets = csv_scraper.scrapeAll()
-    target_path = Path(f"{csv_path}_targets.yml")
-    csv_scraper.dumpTargets(project_dir / target_path, targets)
-
-    asent_results_file = f"{project_dir / 'new_data_results' / csv_path.stem}_asent.csv"
-    asent_nlp = AsentSentimentClassifier()
-    results = asent_nlp.processList(targets)
-    print(f"Dumping asent results to {asent_results_file}")
-    asent_nlp.dumpResults(asent_results_file, results)
-
-    textblob_results_file = f"{project_dir / 'new_data_results' / csv_path.stem}_textblob.csv"
-    textblob_nlp = SentimentClassifier()
-    results = textblob_nlp.processList(targets)
-    print(f"Dumping textblob results to {textblob_results_file}")
-    textblob_nlp.dumpResults(textblob_results_file, results)
-  except Exception as e:
-    print(f"Error trying to process {csv_path}: {e}")
+parser = ArgumentParser(description = "Classify article CSVs with asent and textblob")
+parser.add_argument("data_paths", nargs = "+")
+parser.add_argument(
+    "--workers", type = int, default = 1, help = "Number of classification processes, 1 runs in-process"
+)
+parser.add_argument(
+    "--pipeline",
+    default = "en_core_web_trf",
+    help = "Name or path of the spaCy pipeline to classify with, loaded in every worker"
+)
+parser.add_argument(
+    "--cache",
+    type = Path,
+    default = None,
+    help = "sqlite file for cached classification results, articles repeated across files are only "
+    "parsed once"
+)
+parser.add_argument(
+    "--doc-store",
+    type = Path,
+    default = None,
+    help = "sqlite file of parsed Docs, reused instead of re-parsing"
+)
+parser.add_argument(
+    "--filter",
+    action = "store_true",
+    help = "Skip short, oversized, non-English and duplicate articles before classification, "
+    "duplicates are only dropped within a file"
+)
+parser.add_argument(
+    "--frequency-index",
+    type = Path,
+    default = None,
+    help = "sqlite word frequency index to update with new results"
+)
+parser.add_argument(
+    "--skip-report", type = Path, default = None, help = "CSV listing every article --filter skipped"
+)
+
+
+def classify(
+    classifier: Optional[DualSentimentClassifier],
+    pool: Optional[ClassifierPool],
+    targets: Iterable[ClassificationTarget],
+    textblob_results_file: str,
+    asent_results_file: str
+):
+  """Parse every target once and write textblob and asent results to their own files
+
+    Either way targets are read lazily and rows are streamed to disk, and a run that was interrupted
+    resumes from its checkpoint."""
+  if pool is not None:
+    pool.processToFiles([textblob_results_file, asent_results_file], targets)
+  else:
+    classifier.processListToFiles(textblob_results_file, asent_results_file, targets)
+
+
+def main():
+  # Workers re-import this script, so everything that runs happens under the __main__ guard
+  args = parser.parse_args()
+
+  cache = ResultCache(args.cache) if args.cache else None
+  doc_store = DocStore(args.doc_store) if args.doc_store else None
+
+  frequency_index = FrequencyIndex(args.frequency_index) if args.frequency_index else None
+
+  # One filter per file, so an article syndicated by several sources still counts towards each of them.
+  # With --cache, copies already classified from an earlier file are read from the cache, not parsed again
+  target_filters = []
+
+  # One classifier for every file, workers load their own
+  classifier = (
+      DualSentimentClassifier(args.pipeline, cache = cache, doc_store = doc_store)
+      if args.workers == 1 else None
+  )
+
+  # Workers are started once for the whole run, so each loads the pipeline once rather than once per file
+  workers = (
+      ClassifierPool(
+          DualSentimentClassifier,
+          workers = args.workers,
+          pipeline = args.pipeline,
+          cache = cache,
+          doc_store = doc_store
+      ) if args.workers > 1 else nullcontext()
+  )
+  with workers as pool:
+    for data_path in args.data_paths:
+      try:
+        # Path to scrapes to look at
+        csv_path = Path(data_path)
+
+        # Project root dir
+        project_dir = Path(__file__).parents[1]
+
+        print(f"Loading data from {project_dir / csv_path}")
+        csv_scraper = CSVScraper()
+
+        # Extract text articles, streamed a chunk of rows at a time through the filter and into the
+        # targets file and classifier, so memory doesn't grow with the size of the CSV
+        targets = csv_scraper.iterCSV(project_dir / csv_path)
+        if args.filter:
+          target_filter = TargetFilter()
+          targets = target_filter(targets)
+          target_filters.append(target_filter)
+        target_path = Path(f"{csv_path}_targets.jsonl")
+        targets = teeTargets(project_dir / target_path, targets)
+
+        asent_results_file = f"{project_dir / 'new_data_results' / csv_path.stem}_asent.csv"
+        textblob_results_file = f"{project_dir / 'new_data_results' / csv_path.stem}_textblob.csv"
+        print(f"Writing results to {textblob_results_file} and {asent_results_file}")
+        classify(classifier, pool, targets, textblob_results_file, asent_results_file)
+        # Only known once every row has been read
+        if csv_scraper.empty_bodies:
+          print(f"Skipped {len(csv_scraper.empty_bodies)} rows with empty bodies")
+        if frequency_index is not None:
+          frequency_index.update([textblob_results_file, asent_results_file])
+      except WorkerInitError:
+        # Every later file would fail the same way
+        raise
+      except Exception as e:
+        print(f"Error trying to process {csv_path}: {e}")
+
+  if args.filter:
+    print(f"Filter: {dict(sum((f.summary() for f in target_filters), Counter()))}")
+    if args.skip_report:
+      writeSkipReport(args.skip_report, (s for f in target_filters for s in f.skipped))
+
+  if cache is not None:
+    print(f"Result cache: {cache.stats()}")
+
+
+if __name__ == "__main__":
+  main()
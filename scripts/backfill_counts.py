@@ -0,0 +1,8 @@
+from sys import argv
+
+from ai_sentiment.stats import backfillCounts
+
+# One-off migration: writes token_count and char_count into result CSVs from before they were stored.
+# Loading results only counts them in memory for callers that ask for them, stored counts are always there
+for path in backfillCounts(argv[1:]):
+  print(f"Added token and character counts to {path}")
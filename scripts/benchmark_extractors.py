@@ -0,0 +1,70 @@
+"""Compare HTML-to-text extractor backends on saved pages.
+
+Pages come from .html files (or directories of them) and/or a WebScraper response cache. Every backend is
+timed on the full set, and its output is compared against the original bs4 extractor by word overlap.
+
+Usage: python scripts/benchmark_extractors.py fixtures/html --response-cache web_cache.sqlite
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+
+from ai_sentiment.cache import ResponseCache
+from ai_sentiment.extract import EXTRACTORS
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument("paths", nargs = "*", type = Path, help = "HTML files or directories of them")
+parser.add_argument("--response-cache", type = Path, default = None)
+parser.add_argument("--repeats", type = int, default = 3)
+parser.add_argument("--reference", default = "bs4", choices = EXTRACTORS)
+args = parser.parse_args()
+
+pages = []
+for path in args.paths:
+  files = sorted(path.glob("**/*.htm*")) if path.is_dir() else [path]
+  pages.extend(f.read_text(errors = "replace") for f in files)
+if args.response_cache:
+  cache = ResponseCache(args.response_cache)
+  pages.extend(body for (body,) in cache.db.execute("SELECT body FROM responses"))
+
+if not pages:
+  parser.error("no pages to benchmark")
+
+megabytes = sum(len(p.encode("utf-8", "surrogatepass")) for p in pages) / 1e6
+print(f"{len(pages)} pages, {megabytes:.1f} MB of HTML")
+
+
+def similarity(a: str, b: str) -> float:
+  """Word multiset overlap (weighted Jaccard), 1.0 for identical word counts"""
+  a_words, b_words = Counter(a.split()), Counter(b.split())
+  union = sum((a_words | b_words).values())
+  return sum((a_words & b_words).values()) / union if union else 1.0
+
+
+outputs = {}
+for name, extract in EXTRACTORS.items():
+  try:
+    outputs[name] = [extract(p) for p in pages]
+  except ImportError as e:
+    print(f"{name:>12}: skipped, {e}")
+    continue
+
+  times = []
+  for _ in range(args.repeats):
+    start = perf_counter()
+    for p in pages:
+      extract(p)
+    times.append(perf_counter() - start)
+
+  elapsed = min(times)
+  print(f"{name:>12}: {elapsed:7.3f}s  {megabytes / elapsed:7.1f} MB/s  {len(pages) / elapsed:8.1f} pages/s")
+
+reference = outputs[args.reference]
+for name, texts in outputs.items():
+  scores = [similarity(r, t) for r, t in zip(reference, texts)]
+  identical = sum(r == t for r, t in zip(reference, texts))
+  print(
+      f"{name:>12} vs {args.reference}: mean similarity {sum(scores) / len(scores):.3f}, "
+      f"min {min(scores):.3f}, identical {identical}/{len(texts)}"
+  )
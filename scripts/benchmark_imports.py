@@ -0,0 +1,108 @@
+"""Measure import time of ai_sentiment entry points in fresh interpreters.
+
+Usage: python scripts/benchmark_imports.py --budget 0.3
+Exits non-zero if any budgeted statement exceeds the budget. Loading a
+results file needs pandas, so those statements are budgeted on their time
+beyond importing pandas alone. Results are loaded from a file in the
+current format and from a committed one written before word_scores and
+the count columns existed.
+"""
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+
+from ai_sentiment.data import ClassificationResult, ClassificationTarget
+from ai_sentiment.nlp import SentimentClassifier
+
+# The largest committed results file in the old format
+LEGACY_RESULTS = Path(__file__).parents[1] / "new_data_results"
+LEGACY_RESULTS /= "Old Articles - Wall Street Journal_asent.csv"
+
+# Statement, whether it has to stay within the budget, and whether the pandas baseline is deducted first.
+# {results} is a small results file in the current format, {legacy} is LEGACY_RESULTS
+IMPORTS = [
+    ("from ai_sentiment.nlp import SentimentClassifier", True, False),
+    ("import ai_sentiment", True, False),
+    ("from ai_sentiment.scraper import CSVScraper", True, False),
+    (
+        "from ai_sentiment.nlp import SentimentClassifier; SentimentClassifier.loadResults({results!r})",
+        True,
+        True
+    ),
+    (
+        "from ai_sentiment.nlp import SentimentClassifier; SentimentClassifier.loadResults({legacy!r})",
+        True,
+        True
+    ),
+    (
+        "from ai_sentiment.nlp import SentimentClassifier; "
+        "SentimentClassifier.loadResults({legacy!r}, ['sentiment_score', 'token_count', 'char_count'])",
+        True,
+        True
+    ),
+    ("from ai_sentiment.models import importSpacy; importSpacy()", False, False),
+]
+
+BASELINE = "import pandas"
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument(
+    "--budget", type = float, default = 0.3, help = "Seconds allowed for the budgeted imports"
+)
+parser.add_argument("--repeats", type = int, default = 5)
+parser.add_argument("--top", type = int, default = 5, help = "Show the slowest modules behind each import")
+args = parser.parse_args()
+
+
+def importTime(statement: str) -> float:
+  code = f"from time import perf_counter; s = perf_counter(); {statement}; print(perf_counter() - s)"
+  return float(
+      subprocess.run([sys.executable, "-c", code], check = True, capture_output = True, text = True).stdout
+  )
+
+
+def slowestModules(statement: str) -> list:
+  """Parse python -X importtime output into (cumulative seconds, module) pairs"""
+  stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          check = True,
+                          capture_output = True,
+                          text = True).stderr
+  timings = []
+  for line in stderr.splitlines()[1:]:
+    _, cumulative, module = line.split("|")
+    timings.append((int(cumulative) / 1e6, module.strip()))
+  return sorted(timings, reverse = True)[:args.top]
+
+
+def writeFixture(directory: Path) -> str:
+  """A results file with a few rows, so loading it exercises the result I/O path"""
+  targets = [ClassificationTarget(f"Article {i}", "ChatGPT is good news.", []) for i in range(10)]
+  results = [ClassificationResult(t, 0.7, ["good"], [], [("good", 0.7)], 4, 21) for t in targets]
+  SentimentClassifier.dumpResults(directory / "results", results)
+  return str(directory / "results.csv")
+
+
+over_budget = False
+with TemporaryDirectory() as directory:
+  results = writeFixture(Path(directory))
+  baseline = median(importTime(BASELINE) for _ in range(args.repeats))
+  print(f"{baseline * 1000:8.1f} ms  {BASELINE} (baseline)")
+
+  for statement, budgeted, deduct_baseline in IMPORTS:
+    statement = statement.format(results = results, legacy = str(LEGACY_RESULTS))
+    elapsed = median(importTime(statement) for _ in range(args.repeats))
+    charged = elapsed - baseline if deduct_baseline else elapsed
+    flag = ""
+    if budgeted and charged > args.budget:
+      flag = " OVER BUDGET"
+      over_budget = True
+
+    extra = f" ({charged * 1000:.1f} ms beyond the baseline)" if deduct_baseline else ""
+    print(f"{elapsed * 1000:8.1f} ms  {statement}{extra}{flag}")
+    for seconds, module in slowestModules(statement):
+      print(f"{'':12}{seconds * 1000:8.1f} ms  {module}")
+
+sys.exit(1 if over_budget else 0)
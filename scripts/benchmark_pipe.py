@@ -0,0 +1,45 @@
+"""Compare the per-document classification loop against batched nlp.pipe execution.
+
+Usage: python scripts/benchmark_pipe.py new_data/*.csv --batch-size 32 --limit 200
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+
+from ai_sentiment.nlp import AsentSentimentClassifier, SentimentClassifier
+from ai_sentiment.scraper import CSVScraper
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument("csv_paths", nargs = "+", type = Path)
+parser.add_argument("--pipeline", default = "en_core_web_trf")
+parser.add_argument("--batch-size", type = int, default = 32)
+parser.add_argument("--limit", type = int, default = None, help = "Only classify the first N articles")
+parser.add_argument("--asent", action = "store_true", help = "Benchmark the asent classifier instead")
+args = parser.parse_args()
+
+csv_scraper = CSVScraper()
+for csv_path in args.csv_paths:
+  csv_scraper.queueCSV(csv_path)
+targets = csv_scraper.scrapeAll()[:args.limit]
+n_chars = sum(len(t.body) for t in targets)
+print(f"Loaded {len(targets)} articles ({n_chars} characters) from {len(args.csv_paths)} files")
+
+classifier_cls = AsentSentimentClassifier if args.asent else SentimentClassifier
+classifier = classifier_cls(args.pipeline, batch_size = args.batch_size)
+
+# Warm up so neither path pays for lazy initialisation
+classifier.processList(targets[:args.batch_size])
+
+start = perf_counter()
+loop_results = [classifier.process(t) for t in targets]
+loop_time = perf_counter() - start
+print(f"per-document loop: {loop_time:.2f}s ({len(targets) / loop_time:.2f} docs/s)")
+
+start = perf_counter()
+pipe_results = classifier.processList(targets)
+pipe_time = perf_counter() - start
+print(f"nlp.pipe (batch_size={args.batch_size}): {pipe_time:.2f}s ({len(targets) / pipe_time:.2f} docs/s)")
+
+print(f"speedup: {loop_time / pipe_time:.2f}x")
+mismatches = sum(a.sentiment_score != b.sentiment_score for a, b in zip(loop_results, pipe_results))
+print(f"score mismatches between paths: {mismatches}")
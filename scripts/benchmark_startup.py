@@ -0,0 +1,50 @@
+"""Compare classifier cold start from the installed model against a compiled snapshot.
+
+Each measurement runs in a fresh interpreter so that nothing is already imported or loaded.
+
+Usage: python scripts/benchmark_startup.py --snapshot models/en_core_web_trf_sentiment --repeats 3
+"""
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+
+from ai_sentiment.models import compilePipeline
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument("--pipeline", default = "en_core_web_trf")
+parser.add_argument(
+    "--snapshot", type = Path, required = True, help = "Compiled here first if it doesn't exist"
+)
+parser.add_argument("--classifier", default = "DualSentimentClassifier")
+parser.add_argument("--repeats", type = int, default = 3)
+args = parser.parse_args()
+
+if not args.snapshot.exists():
+  print(f"Compiling snapshot to {args.snapshot}")
+  compilePipeline(args.snapshot, args.pipeline)
+
+# Times construction plus a first document, prints the seconds taken
+STARTUP = """
+from time import perf_counter
+start = perf_counter()
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.nlp import {classifier}
+classifier = {classifier}({pipeline!r})
+classifier.process(ClassificationTarget("warmup", "This is a short test sentence.", []))
+print(perf_counter() - start)
+"""
+
+
+def coldStart(pipeline: str) -> float:
+  code = STARTUP.format(classifier = args.classifier, pipeline = pipeline)
+  return float(
+      subprocess.run([sys.executable, "-c", code], check = True, capture_output = True, text = True).stdout
+  )
+
+
+for label, pipeline in (("installed model", args.pipeline), ("snapshot", str(args.snapshot))):
+  times = [coldStart(pipeline) for _ in range(args.repeats)]
+  runs = ", ".join(f"{t:.2f}" for t in times)
+  print(f"{label}: median {median(times):.2f}s over {args.repeats} runs ({runs})")
@@ -0,0 +1,76 @@
+"""Convert YAML target files to JSONL target stores and compare their load times.
+
+Each .yml file (written by Scraper.dumpTargets) is converted to a .jsonl TargetStore next to it, unless one
+already exists. Without arguments, a synthetic set of targets is generated instead.
+
+Usage: python scripts/benchmark_targets.py data/*_targets.yml
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.scraper import Scraper
+from ai_sentiment.targets import TargetStore, convertYamlTargets
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument("paths", nargs = "*", type = Path, help = "YAML target files")
+parser.add_argument(
+    "--synthetic", type = int, default = 5000, help = "Targets generated when no paths are given"
+)
+parser.add_argument("--repeats", type = int, default = 3)
+parser.add_argument("--overwrite", action = "store_true", help = "Reconvert files that already have a store")
+args = parser.parse_args()
+
+
+def timed(fn) -> float:
+  times = []
+  for _ in range(args.repeats):
+    start = perf_counter()
+    fn()
+    times.append(perf_counter() - start)
+  return min(times)
+
+
+def randomAccess(store_path: Path):
+  with TargetStore(store_path) as store:
+    rng = Random(0)
+    for _ in range(1000):
+      store[rng.randrange(len(store))]
+
+
+def benchmark(yaml_path: Path, store_path: Path):
+  yaml_time = timed(lambda: Scraper.loadTargets(yaml_path))
+  store_time = timed(lambda: Scraper.loadTargets(store_path))
+  with TargetStore(store_path) as store:
+    count = len(store)
+
+  print(f"{yaml_path.name}: {count} targets")
+  print(f"  yaml load:         {yaml_time:8.3f}s")
+  print(f"  jsonl load:        {store_time:8.3f}s  ({yaml_time / store_time:.1f}x)")
+  if count:
+    print(f"  1000 random reads: {timed(lambda: randomAccess(store_path)):8.3f}s")
+
+
+if args.paths:
+  for yaml_path in args.paths:
+    store_path = yaml_path.with_suffix(".jsonl")
+    if args.overwrite or not store_path.exists():
+      convertYamlTargets(yaml_path, store_path)
+      print(f"Converted {yaml_path} to {store_path}")
+    benchmark(yaml_path, store_path)
+else:
+  rng = Random(0)
+  words = [
+      "model", "chatbot", "regulation", "jobs", "risk", "openai", "research", "safety", "the", "of", "and"
+  ]
+  targets = [
+      ClassificationTarget(f"Article {i}", " ".join(rng.choices(words, k = rng.randint(50, 2000))), ["news"])
+      for i in range(args.synthetic)
+  ]
+  with TemporaryDirectory() as tmp:
+    yaml_path = Path(tmp) / "synthetic_targets.yml"
+    Scraper.dumpTargets(yaml_path, targets)
+    benchmark(yaml_path, convertYamlTargets(yaml_path))
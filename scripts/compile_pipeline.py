@@ -0,0 +1,17 @@
+"""Write the configured classification pipeline to a local snapshot directory.
+
+Usage: python scripts/compile_pipeline.py models/en_core_web_trf_sentiment
+Then pass the directory as the pipeline argument of any classifier.
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+
+from ai_sentiment.models import SENTIMENT_PIPES, compilePipeline
+
+parser = ArgumentParser(description = __doc__)
+parser.add_argument("output_dir", type = Path)
+parser.add_argument("--pipeline", default = "en_core_web_trf")
+args = parser.parse_args()
+
+print(f"Compiling {args.pipeline} + {', '.join(SENTIMENT_PIPES)} to {args.output_dir}")
+compilePipeline(args.output_dir, args.pipeline)
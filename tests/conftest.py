@@ -0,0 +1,96 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple
+from urllib.parse import urlsplit
+
+import pytest
+
+
+class Response(NamedTuple):
+  status: int = 200
+  body: str = ""
+  headers: dict = {}
+  delay: float = 0.0
+  content_type: str = "text/html; charset=utf-8"
+
+
+class QuietServer(ThreadingHTTPServer):
+  daemon_threads = True
+
+  def handle_error(self, request, client_address):
+    # Clients that time out hang up before the response is written
+    pass
+
+
+class StandInSite:
+
+  def __init__(self):
+    """Local HTTP server standing in for a news site or the Reddit API
+
+        Each path, ignoring the query string, answers GETs and POSTs with its
+        list of responses in turn, repeating the last one. Every request is
+        recorded, along with the most requests that were ever being served
+        at once."""
+
+    self.routes: Dict[str, List[Response]] = {}
+    self.requests: List[str] = []
+    self.active = 0
+    self.max_active = 0
+    self.lock = threading.Lock()
+
+    site = self
+
+    class Handler(BaseHTTPRequestHandler):
+
+      def do_GET(self):
+        path = urlsplit(self.path).path
+        with site.lock:
+          site.requests.append(path)
+          served = site.requests.count(path)
+          responses = site.routes.get(path, [Response(404, "not found")])
+          response = responses[min(served, len(responses)) - 1]
+          site.active += 1
+          site.max_active = max(site.max_active, site.active)
+        try:
+          time.sleep(response.delay)
+          body = response.body.encode()
+          self.send_response(response.status)
+          self.send_header("Content-Type", response.content_type)
+          self.send_header("Content-Length", str(len(body)))
+          for name, value in response.headers.items():
+            self.send_header(name, value)
+          self.end_headers()
+          self.wfile.write(body)
+        finally:
+          with site.lock:
+            site.active -= 1
+
+      def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+      def log_message(self, *args):
+        pass
+
+    self.server = QuietServer(("127.0.0.1", 0), Handler)
+    self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+
+  def route(self, path: str, *responses: Response):
+    self.routes[path] = list(responses) or [Response()]
+
+  def url(self, path: str) -> str:
+    return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+
+def page(text: str) -> str:
+  return f"<html><body><p>{text}</p></body></html>"
+
+
+@pytest.fixture
+def site():
+  site = StandInSite()
+  site.thread.start()
+  yield site
+  site.server.shutdown()
+  site.server.server_close()
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.nlp import SentimentClassifier
+
+
+@pytest.fixture(scope = "module")
+def classifier():
+  return SentimentClassifier("blank:en", batch_size = 4)
+
+
+def repeatedTargets():
+  """80 targets, every body appearing twice"""
+  bodies = [f"Article {i} is good news." if i % 2 else f"Article {i} is terrible news." for i in range(40)]
+  return [ClassificationTarget(f"title {i % 40}", bodies[i % 40], []) for i in range(80)]
+
+
+def titles(path):
+  return SentimentClassifier.loadResults(path)["titles"].tolist()
+
+
+@pytest.mark.parametrize("checkpoint_every", [1, 7, 100])
+def test_repeated_targets_written_once_per_occurrence(classifier, tmp_path, checkpoint_every):
+  targets = repeatedTargets()
+  classifier.processListToFile(tmp_path / "results", targets, checkpoint_every = checkpoint_every)
+
+  assert titles(tmp_path / "results.csv") == [t.title for t in targets]
+  assert not (tmp_path / "results.checkpoint").exists()
+
+
+def test_resume_after_interruption(classifier, tmp_path):
+  targets = repeatedTargets()
+
+  def interrupted():
+    for i, target in enumerate(targets):
+      if i == 50:
+        raise KeyboardInterrupt
+      yield target
+
+  with pytest.raises(KeyboardInterrupt):
+    classifier.processListToFile(tmp_path / "results", interrupted(), checkpoint_every = 1)
+  assert (tmp_path / "results.checkpoint").exists()
+
+  classifier.processListToFile(tmp_path / "results", targets, checkpoint_every = 1)
+  results = pd.read_csv(tmp_path / "results.csv", index_col = 0)
+  assert results["titles"].tolist() == [t.title for t in targets]
+  assert results.index.tolist() == list(range(80))
@@ -0,0 +1,50 @@
+import random
+
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.filters import MinHashIndex, TargetFilter
+
+WORDS = (
+    "the of and to in that is for it with as on was by at this be from have are has an not which or but they "
+    "chatbot model company school students teachers chips market investors search engine launch rivals "
+    "classroom policy essay exam revenue shares demand data centers graphics cards lawmakers regulators "
+    "privacy users answers questions researchers benchmark accuracy training language"
+).split()
+
+PHRASE = "an ai powered chatbot similar to chatgpt"
+
+
+def article(seed: int, words: int = 400) -> str:
+  rng = random.Random(seed)
+  return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def target(title: str, body: str) -> ClassificationTarget:
+  return ClassificationTarget(title, body, [])
+
+
+def test_shared_phrase_is_not_near_duplicate():
+  # Unrelated articles quoting the same short phrase used to get identical signatures
+  first = f"{PHRASE} {article(1)}"
+  second = f"{article(2)} {PHRASE} {article(3, 100)}"
+
+  target_filter = TargetFilter()
+  kept = target_filter.filterList([target("first", first), target("second", second)])
+  assert [t.title for t in kept] == ["first", "second"]
+
+
+def test_syndicated_copy_is_near_duplicate():
+  body = article(4)
+  copy = f"By a staff writer. {body} Reporting by a correspondent, editing by a desk editor."
+
+  target_filter = TargetFilter()
+  kept = target_filter.filterList([target("original", body), target("copy", copy)])
+  assert [t.title for t in kept] == ["original"]
+  assert target_filter.skipped[0].reason == "near_duplicate"
+
+
+def test_signature_estimates_jaccard():
+  index = MinHashIndex(num_perm = 256)
+  unrelated = [index.signature(article(seed)) for seed in range(5, 25)]
+  for i, signature in enumerate(unrelated):
+    for other in unrelated[i + 1:]:
+      assert (signature == other).mean() < 0.1
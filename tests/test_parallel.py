@@ -0,0 +1,69 @@
+import pytest
+
+from ai_sentiment.data import ClassificationTarget
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.parallel import ClassifierPool, WorkerInitError, processParallel
+
+
+def articles(count, offset = 0):
+  return [
+      ClassificationTarget(f"title {i}", f"Article {i} is good news.", [])
+      for i in range(offset, offset + count)
+  ]
+
+
+def test_shard_size_spreads_small_lists_over_workers():
+  with ClassifierPool(workers = 4, batch_size = 32) as pool:
+    assert pool.shardSize(58) == 15
+    assert pool.shardSize(3) == 1
+    assert pool.shardSize(0) == 1
+    # Capped at a bucket
+    assert pool.shardSize(100_000) == pool.bucket_size
+
+
+def test_pool_is_reused_across_lists():
+  with ClassifierPool(workers = 2, pipeline = "blank:en") as pool:
+    first = list(pool.process(articles(10)))
+    processes = set(pool.executor._processes)
+    second = list(pool.process(articles(7, offset = 10)))
+
+    assert set(pool.executor._processes) == processes
+    assert len(processes) <= 2
+
+  assert [r.target.title for r in first + second] == [f"title {i}" for i in range(17)]
+
+
+def test_process_parallel_matches_in_process():
+  targets = articles(9)
+  expected = SentimentClassifier("blank:en").processList(targets)
+  assert list(processParallel(targets, workers = 2, pipeline = "blank:en")) == expected
+
+
+def interrupted(targets, after):
+  """Yield the first after targets, then fail as if the run was killed"""
+  yield from targets[:after]
+  raise KeyboardInterrupt
+
+
+def test_pool_writes_and_resumes_files_like_in_process(tmp_path, capsys):
+  targets = articles(12)
+  SentimentClassifier("blank:en").processListToFile(tmp_path / "local", targets)
+
+  with ClassifierPool(workers = 2, pipeline = "blank:en") as pool:
+    with pytest.raises(KeyboardInterrupt):
+      pool.processToFiles([tmp_path / "pool"], interrupted(targets, 11), checkpoint_every = 2, shard_size = 2)
+    assert (tmp_path / "pool.checkpoint").exists()
+
+    pool.processToFiles([tmp_path / "pool"], targets, checkpoint_every = 2)
+    # The first two shards were written before the interruption
+    assert "skipping 4 finished targets" in capsys.readouterr().out
+
+  assert (tmp_path / "pool.csv").read_text() == (tmp_path / "local.csv").read_text()
+  assert not (tmp_path / "pool.checkpoint").exists()
+
+
+def test_worker_init_failure_is_reported_by_every_call():
+  with ClassifierPool(workers = 1, pipeline = "no_such_pipeline") as pool:
+    for _ in range(2):
+      with pytest.raises(WorkerInitError, match = "no_such_pipeline"):
+        list(pool.process(articles(3)))
@@ -0,0 +1,62 @@
+import threading
+
+from conftest import Response, page
+
+from ai_sentiment.cache import ResponseCache, ResultCache
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.pipeline import runPipeline, scrapeStream
+from ai_sentiment.scraper import WebQueueElement, WebScraper
+
+
+def test_web_scraper_with_response_cache(site, tmp_path):
+  # The cache is opened here and used from the scraper's producer thread
+  cache = ResponseCache(tmp_path / "responses.sqlite")
+  scraper = WebScraper(cache = cache)
+  for i in range(5):
+    site.route(f"/{i}", Response(body = page(f"Article {i} is great news.")))
+    scraper.queue.append(WebQueueElement(f"title {i}", site.url(f"/{i}"), None))
+
+  results = list(runPipeline([scraper], SentimentClassifier("blank:en")))
+
+  assert [r.target.title for r in results] == [f"title {i}" for i in range(5)]
+  assert results[0].target.body == "article 0 is great news."
+  assert len(cache) == 5
+  cache.close()
+
+
+def test_caches_usable_from_other_threads(tmp_path):
+  results = ResultCache(tmp_path / "results.sqlite")
+  responses = ResponseCache(tmp_path / "responses.sqlite")
+  errors = []
+
+  def work(i):
+    try:
+      results.put(str(i), i)
+      responses.put(f"/{i}", "body")
+      assert results.get(str(i)) == i
+      assert f"/{i}" in responses
+    except Exception as e:
+      errors.append(e)
+
+  threads = [threading.Thread(target = work, args = (i,)) for i in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  assert errors == []
+  assert len(results) == 8 and len(responses) == 8
+  results.close()
+  responses.close()
+
+
+def test_scrape_stream_keeps_each_scraper_in_order(site):
+  scrapers = [WebScraper(), WebScraper()]
+  for s, scraper in enumerate(scrapers):
+    for i in range(3):
+      site.route(f"/{s}/{i}", Response(body = page(f"{s} {i}")))
+      scraper.queue.append(WebQueueElement(f"{s} {i}", site.url(f"/{s}/{i}"), None))
+
+  titles = [t.title for t in scrapeStream(scrapers)]
+  for s in range(2):
+    assert [t for t in titles if t.startswith(str(s))] == [f"{s} {i}" for i in range(3)]
@@ -0,0 +1,178 @@
+import json
+import sys
+import time
+import types
+from functools import partial
+
+import praw
+import pytest
+
+from conftest import Response
+
+from ai_sentiment.scraper import RedditQueueElement, RedditScraper
+
+JSON = "application/json; charset=UTF-8"
+POST_URL = "https://www.reddit.com/r/test/comments/abc123/post/"
+
+
+def thing(kind, **data):
+  return dict(kind = kind, data = data)
+
+
+def comment(id, body):
+  return thing(
+      "t1",
+      id = id,
+      name = f"t1_{id}",
+      author = f"user_{id}",
+      body = body,
+      replies = "",
+      parent_id = "t3_abc123",
+      link_id = "t3_abc123"
+  )
+
+
+def more(id, count, children):
+  return thing(
+      "more",
+      id = id,
+      name = f"t1_{id}",
+      count = count,
+      children = children,
+      parent_id = "t3_abc123",
+      depth = 0
+  )
+
+
+def listing(*children):
+  return thing("Listing", children = list(children), after = None, before = None)
+
+
+def moreChildren(*things):
+  result = dict(errors = [], data = dict(things = list(things)))
+  return Response(body = json.dumps(dict(json = result)), content_type = JSON)
+
+
+class Objectify:
+  """Stand-in for URS's Objectify, a git submodule, keeping only the fields scrapeElement uses"""
+
+  def make_comment(self, comment, include_all):
+    return dict(author = str(comment.author), body = comment.body)
+
+
+@pytest.fixture
+def reddit(site, monkeypatch):
+  """Point praw at the stand-in site, serving one submission with two "load more" stubs"""
+  monkeypatch.setenv("CLIENT_ID", "client")
+  monkeypatch.setenv("CLIENT_SECRET", "secret")
+  monkeypatch.setenv("USER_AGENT", "ai_sentiment tests")
+  monkeypatch.delenv("REDDIT_USERNAME", raising = False)
+  monkeypatch.delenv("REDDIT_PASSWORD", raising = False)
+  endpoints = partial(praw.Reddit, oauth_url = site.url(""), reddit_url = site.url(""))
+  monkeypatch.setattr(praw, "Reddit", endpoints)
+
+  objectify = types.ModuleType("URS.urs.praw_scrapers.utils.Objectify")
+  objectify.Objectify = Objectify
+  for name in ["URS", "URS.urs", "URS.urs.praw_scrapers", "URS.urs.praw_scrapers.utils"]:
+    monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+  monkeypatch.setitem(sys.modules, objectify.__name__, objectify)
+
+  token = dict(access_token = "token", expires_in = 3600, scope = "*", token_type = "bearer")
+  site.route("/api/v1/access_token", Response(body = json.dumps(token), content_type = JSON))
+  submission = listing(thing("t3", id = "abc123", name = "t3_abc123", title = "post", num_comments = 3))
+  comments = listing(comment("c1", "first"), more("m1", 2, ["c2"]), more("m2", 1, ["c3"]))
+  site.route("/comments/abc123/", Response(body = json.dumps([submission, comments]), content_type = JSON))
+  site.route(
+      "/api/morechildren/", moreChildren(comment("c2", "second")), moreChildren(comment("c3", "third"))
+  )
+  return site
+
+
+def countCharges(scraper):
+  charges = []
+  wait = scraper.rate_limiter.wait
+
+  def countedWait():
+    charges.append(time.monotonic())
+    wait()
+
+  scraper.rate_limiter.wait = countedWait
+  return charges
+
+
+@pytest.mark.parametrize(
+    "limit, expanded, body",
+    [
+        (0, 0, "user_c1: first. "),
+        (1, 1, "user_c1: first. user_c2: second. "),
+        (None, 2, "user_c1: first. user_c2: second. user_c3: third. "),
+    ]
+)
+def test_reddit_charges_limiter_for_every_request(reddit, limit, expanded, body):
+  scraper = RedditScraper(["post"], replace_more_limit = limit, requests_per_minute = 6000)
+  charges = countCharges(scraper)
+  scraper.queue.append(RedditQueueElement("post", POST_URL, ["t"]))
+
+  target = scraper.scrapeNext()
+
+  assert target.body == body
+  # Token, submission and one request per expanded stub
+  assert reddit.requests.count("/api/morechildren/") == expanded
+  assert len(charges) == len(reddit.requests) == 2 + expanded
+
+
+def test_reddit_spaces_expansions_within_budget(reddit):
+  scraper = RedditScraper(["post"], replace_more_limit = None, requests_per_minute = 600)
+  charges = countCharges(scraper)
+  scraper.queue.append(RedditQueueElement("post", POST_URL, ["t"]))
+
+  start = time.monotonic()
+  scraper.scrapeNext()
+
+  # Four requests at 0.1 s apart, the first one is free
+  assert len(charges) == 4
+  assert time.monotonic() - start >= 0.3
+
+
+def test_reddit_threaded_keeps_queue_order_and_shares_limiter(reddit):
+  scraper = RedditScraper(["post"], requests_per_minute = 6000)
+  charges = countCharges(scraper)
+  for i in range(6):
+    scraper.queue.append(RedditQueueElement(f"post {i}", POST_URL, [str(i)]))
+
+  targets = scraper.scrapeAllThreaded(workers = 3)
+
+  assert [t.title for t in targets] == [f"post {i}" for i in range(6)]
+  assert {t.body for t in targets} == {"user_c1: first. "}
+  assert len(scraper.queue) == 0
+  # Every thread's client is charged on the same limiter
+  assert len(charges) == len(reddit.requests)
+
+
+def test_reddit_scrape_all_stays_serial(reddit):
+  scraper = RedditScraper(["post"], requests_per_minute = 6000)
+  for i in range(3):
+    scraper.queue.append(RedditQueueElement(f"post {i}", POST_URL, [str(i)]))
+
+  targets = scraper.scrapeAll()
+
+  assert [t.title for t in targets] == ["post 0", "post 1", "post 2"]
+  # Only the scraper's own client, worker threads would each fetch a token for theirs
+  assert reddit.requests.count("/api/v1/access_token") == 1
+
+
+def test_reddit_threaded_submits_a_bounded_window(reddit):
+  scraper = RedditScraper(["post"], requests_per_minute = 6000)
+  for i in range(20):
+    scraper.queue.append(RedditQueueElement(f"post {i}", POST_URL, [str(i)]))
+
+  targets = scraper.scrapeIterThreaded(workers = 2)
+  assert next(targets).title == "post 0"
+  time.sleep(0.2)
+
+  # Two workers with two submissions each, nothing more is fetched until the consumer reads on
+  assert len(scraper.queue) == 16
+  assert reddit.requests.count("/comments/abc123/") == 4
+
+  assert [t.title for t in targets] == [f"post {i}" for i in range(1, 20)]
+  assert reddit.requests.count("/comments/abc123/") == 20
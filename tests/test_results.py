@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.stats import bodyCounts
+
+REPO = Path(__file__).resolve().parents[1]
+
+
+def writeOldResults(path):
+  """Results file from before word_scores, token_count and char_count were stored"""
+  pd.DataFrame({
+      "titles": ["a", "b"],
+      "body_contents": ["Two words.", ""],
+      "tags": ["[]", "[]"],
+      "sentiment_score": [0.5, 0.0],
+      "positive_words": ["['words']", "[]"],
+      "negative_words": ["[]", "[]"],
+  }).to_csv(path)
+
+
+def test_old_results_get_counts_without_changing_the_file(tmp_path):
+  path = tmp_path / "old_asent.csv"
+  writeOldResults(path)
+  before = path.read_bytes()
+
+  results = SentimentClassifier.loadResults(
+      path, ["sentiment_score", "word_scores", "token_count", "char_count"]
+  )
+
+  assert results["token_count"].tolist() == [2, 0]
+  assert results["char_count"].tolist() == [10, 0]
+  assert results["word_scores"].tolist() == [[], []]
+  assert path.read_bytes() == before
+
+
+def test_old_results_load_without_counting(tmp_path):
+  path = tmp_path / "old_asent.csv"
+  writeOldResults(path)
+
+  # A fresh interpreter, so modules imported by other tests don't hide an import of spaCy
+  script = (
+      "import sys; from ai_sentiment.nlp import SentimentClassifier; "
+      f"df = SentimentClassifier.loadResults({str(path)!r}); "
+      "print(sorted(df.columns)); print('spacy' in sys.modules)"
+  )
+  out = subprocess.run([sys.executable, "-c", script],
+                       cwd = REPO,
+                       capture_output = True,
+                       text = True,
+                       check = True)
+  columns, spacy_imported = out.stdout.splitlines()
+
+  assert "token_count" not in columns and "char_count" not in columns
+  assert "word_scores" in columns
+  assert spacy_imported == "False"
+
+
+def test_counts_use_the_word_definition_of_the_corpus_stats():
+  bodies = ["It's a well-known fact, isn't it?", None]
+
+  counts = bodyCounts(bodies)
+
+  # The \w+ runs the stats script counted before token_count was stored
+  assert counts["token_count"].tolist() == [9, 0]
+  assert counts["char_count"].tolist() == [33, 0]
@@ -0,0 +1,99 @@
+import time
+
+from conftest import Response, page
+
+from ai_sentiment.scraper import WebQueueElement, WebScraper
+
+
+def queuePages(site, scraper, count, delay = 0.0, prefix = "/article"):
+  for i in range(count):
+    path = f"{prefix}/{i}"
+    site.route(path, Response(body = page(f"article {i}"), delay = delay))
+    scraper.queue.append(WebQueueElement(f"title {i}", site.url(path), None))
+
+
+def test_async_keeps_queue_order(site):
+  scraper = WebScraper()
+  for i in range(12):
+    # Later pages answer first
+    site.route(f"/{i}", Response(body = page(f"article {i}"), delay = 0.02 * (12 - i)))
+    scraper.queue.append(WebQueueElement(f"title {i}", site.url(f"/{i}"), [str(i)]))
+
+  targets = scraper.scrapeAllAsync(concurrency = 12, per_host = 12)
+
+  assert [t.title for t in targets] == [f"title {i}" for i in range(12)]
+  assert [t.body for t in targets] == [f"article {i}" for i in range(12)]
+  assert [t.tags for t in targets] == [[str(i)] for i in range(12)]
+  assert scraper.failed == []
+  assert len(scraper.queue) == 0
+
+
+def test_async_retries_unavailable_with_backoff(site):
+  scraper = WebScraper(retries = 3, backoff = 0.1)
+  site.route("/busy", Response(503), Response(503), Response(body = page("finally")))
+  scraper.queue.append(WebQueueElement("busy", site.url("/busy"), None))
+
+  start = time.perf_counter()
+  targets = scraper.scrapeAllAsync()
+  elapsed = time.perf_counter() - start
+
+  assert [t.body for t in targets] == ["finally"]
+  assert site.requests == ["/busy"] * 3
+  # 0.1 s before the first retry, doubled before the second
+  assert elapsed >= 0.3
+
+
+def test_async_gives_up_after_retries(site):
+  scraper = WebScraper(retries = 2, backoff = 0.01)
+  site.route("/down", Response(503))
+  scraper.queue.append(WebQueueElement("down", site.url("/down"), None))
+
+  assert scraper.scrapeAllAsync() == []
+  assert site.requests == ["/down"] * 3
+  assert [element.title for element, _ in scraper.failed] == ["down"]
+
+
+def test_async_not_found_is_failed_without_retry(site):
+  scraper = WebScraper(backoff = 0.01)
+  queuePages(site, scraper, 2)
+  scraper.queue.insert(1, WebQueueElement("missing", site.url("/missing"), None))
+
+  targets = scraper.scrapeAllAsync()
+
+  assert [t.title for t in targets] == ["title 0", "title 1"]
+  assert site.requests.count("/missing") == 1
+  (element, error), = scraper.failed
+  assert element.title == "missing"
+  assert error.status == 404
+
+
+def test_async_per_host_limit(site):
+  scraper = WebScraper()
+  queuePages(site, scraper, 12, delay = 0.1)
+
+  targets = scraper.scrapeAllAsync(concurrency = 32, per_host = 3)
+
+  assert len(targets) == 12
+  assert site.max_active == 3
+
+
+def test_async_timeout_excludes_time_waiting_for_a_slot(site):
+  # 20 pages through 2 connections take 2.5 s overall, far longer than the timeout,
+  # but each request only takes 0.25 s once it is sent
+  scraper = WebScraper(timeout = 1, retries = 0)
+  queuePages(site, scraper, 20, delay = 0.25)
+
+  targets = scraper.scrapeAllAsync(per_host = 2)
+
+  assert scraper.failed == []
+  assert len(targets) == 20
+  assert site.max_active == 2
+
+
+def test_async_timeout_still_applies_to_slow_pages(site):
+  scraper = WebScraper(timeout = 0.2, retries = 0)
+  queuePages(site, scraper, 1, delay = 0.5)
+
+  assert scraper.scrapeAllAsync() == []
+  (_, error), = scraper.failed
+  assert isinstance(error, TimeoutError)
@@ -0,0 +1,20 @@
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.scraper import CSVScraper
+from ai_sentiment.targets import loadTargets, teeTargets
+
+
+def test_csv_rows_are_classified_as_they_are_read(tmp_path):
+  rows = [f"title {i},https://example.com/{i},Article {i} is good news." for i in range(100)]
+  csv_path = tmp_path / "articles.csv"
+  csv_path.write_text("\n".join(["Title,Link,Body"] + rows) + "\n")
+  store_path = tmp_path / "articles_targets.jsonl"
+
+  targets = teeTargets(store_path, CSVScraper().iterCSV(csv_path, chunk_rows = 10))
+  results = SentimentClassifier("blank:en", batch_size = 2).processIter(targets)
+
+  # Only the first bucket has been read when its results come out, not the whole file
+  assert next(results).target.title == "title 0"
+  assert 0 < store_path.read_bytes().count(b"\n") < 100
+
+  assert len(list(results)) == 99
+  assert [t.title for t in loadTargets(store_path)] == [f"title {i}" for i in range(100)]
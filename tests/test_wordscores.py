@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from ai_sentiment.corpus import loadCorpus
+from ai_sentiment.data import ClassificationResult, ClassificationTarget
+from ai_sentiment.nlp import SentimentClassifier
+from ai_sentiment.wordscores import explodeWordScores, wordScoreStats
+
+CSV_CELL = [("good", 0.5), ("bad", -0.7)]
+PARQUET_CELL = [{ "word": "good", "score": 0.75}]
+
+
+@pytest.mark.parametrize("cells", [[CSV_CELL, PARQUET_CELL], [PARQUET_CELL, CSV_CELL]])
+def test_explode_mixed_formats(cells):
+  corpus = pd.DataFrame({ "source": ["a", "b"], "alignment": ["LEFT", "RIGHT"], "word_scores": cells})
+
+  occurrences = explodeWordScores(corpus)
+
+  pairs = sorted(zip(occurrences["word"], occurrences["score"]))
+  assert pairs == [("bad", -0.7), ("good", 0.5), ("good", 0.75)]
+  stats = wordScoreStats(corpus, by = ["alignment"])
+  assert stats["count"].sum() == 3
+
+
+def results(scores):
+  return [
+      ClassificationResult(ClassificationTarget(f"title {i}", "Some body.", []), 0.1, [], [], s, 2, 10)
+      for i, s in enumerate(scores)
+  ]
+
+
+def test_load_corpus_same_word_scores_with_and_without_snapshot(tmp_path):
+  pytest.importorskip("pyarrow")
+  csv_path = tmp_path / "AI Ethics - Vox_asent"
+  parquet_path = tmp_path / "AI Ethics - Reuters_asent"
+  SentimentClassifier.dumpResults(csv_path, results([CSV_CELL, []]))
+  SentimentClassifier.dumpResults(parquet_path, results([[("good", 0.75)]]), format = "parquet")
+
+  paths = [csv_path.with_suffix(".csv"), parquet_path.with_suffix(".parquet")]
+  columns = ["sentiment_score", "word_scores"]
+  built = loadCorpus(paths, columns, snapshot_dir = tmp_path / "snapshots")
+  snapshot = loadCorpus(paths, columns, snapshot_dir = tmp_path / "snapshots")
+
+  expected = [CSV_CELL, [], [("good", 0.75)]]
+  assert built["word_scores"].tolist() == expected
+  assert snapshot["word_scores"].tolist() == expected